@@ -0,0 +1,60 @@
+import logging
+
+from sqlalchemy import select, func, cast, Integer
+
+from app import db
+from models import Product
+from sequences import BlockAllocator, reserve_block
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+BARCODE_SEQUENCE = 'product-barcode'
+FIRST_BARCODE = 10000
+LAST_BARCODE = 99999
+
+
+def _first_free_barcode(conn):
+    """Start a new barcode sequence after the highest numeric barcode already in use"""
+    # Compared as numbers: legacy barcodes aren't all zero-padded ('9', '123').
+    # Codes that aren't numbers cast to 0 and don't count.
+    number = cast(Product.barcode, Integer)
+    highest = conn.execute(
+        select(func.max(number)).where(number.between(1, LAST_BARCODE))
+    ).scalar()
+    return max(FIRST_BARCODE, (highest or 0) + 1)
+
+
+def _format_barcode(value):
+    if value > LAST_BARCODE:
+        raise ValueError("The 5-digit barcode range is exhausted")
+    return str(value).zfill(5)
+
+
+barcode_allocator = BlockAllocator(block_size=10, start=_first_free_barcode)
+
+
+def _taken_barcodes(barcodes):
+    return set(db.session.scalars(select(Product.barcode).where(Product.barcode.in_(barcodes))))
+
+
+def allocate_barcode():
+    """Hand out one unused 5-digit product barcode"""
+    while True:
+        barcode = _format_barcode(barcode_allocator.next_value(BARCODE_SEQUENCE))
+        # Barcodes can also be typed in by hand, so the sequence may run into one
+        if not _taken_barcodes([barcode]):
+            return barcode
+        logger.info(f"Skipping barcode {barcode}, already in use")
+
+
+def allocate_barcodes(count):
+    """Reserve `count` unused barcodes, a block per round trip, for bulk imports"""
+    barcodes = []
+    while len(barcodes) < count:
+        first, last = reserve_block(BARCODE_SEQUENCE, count - len(barcodes), start=_first_free_barcode)
+        _format_barcode(last)
+        block = [_format_barcode(value) for value in range(first, last + 1)]
+        taken = _taken_barcodes(block)
+        barcodes.extend(barcode for barcode in block if barcode not in taken)
+    return barcodes
@@ -0,0 +1,182 @@
+import io
+import os
+import logging
+import zipfile
+import multiprocessing
+from types import SimpleNamespace
+from datetime import timedelta
+
+import click
+from sqlalchemy.orm import selectinload
+
+from app import app, db
+from models import Invoice, InvoiceItem
+from pdf_cache import cached_invoice_pdf
+from export_worker import render_invoice
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Invoices handed to a worker at a time, and loaded and handed to the pool at a time
+EXPORT_CHUNK_SIZE = 4
+EXPORT_BATCH_SIZE = 64
+
+# Invoices looked up in the PDF cache per query
+CACHE_LOOKUP_BATCH = 500
+
+# Most render processes an export starts (default: CPU count)
+EXPORT_PROCESSES = int(os.environ.get('EXPORT_PROCESSES', 0)) or os.cpu_count() or 1
+
+
+def export_invoice_ids(start=None, end=None, status=None):
+    """Ids of the invoices to export; `end` is inclusive"""
+    query = db.session.query(Invoice.id)
+    if start:
+        query = query.filter(Invoice.issue_date >= start)
+    if end:
+        query = query.filter(Invoice.issue_date < end + timedelta(days=1))
+    if status:
+        query = query.filter(Invoice.status == status)
+    return [invoice_id for (invoice_id,) in query.order_by(Invoice.id).all()]
+
+
+def _snapshot(invoice):
+    """Copy what the PDF renderer reads into plain objects a worker process can unpickle"""
+    def named(record):
+        return SimpleNamespace(name=record.name) if record else None
+
+    customer = invoice.customer
+    return SimpleNamespace(
+        id=invoice.id,
+        invoice_number=invoice.invoice_number,
+        status=invoice.status,
+        issue_date=invoice.issue_date,
+        due_date=invoice.due_date,
+        created_at=invoice.created_at,
+        created_by=invoice.created_by,
+        total_amount=invoice.total_amount,
+        tax_amount=invoice.tax_amount,
+        discount=invoice.discount,
+        final_amount=invoice.final_amount,
+        customer=SimpleNamespace(name=customer.name, email=customer.email,
+                                 phone=customer.phone, address=customer.address),
+        items=[SimpleNamespace(product=named(item.product), service=named(item.service),
+                               is_service=item.is_service, quantity=item.quantity,
+                               unit_price=item.unit_price, total_price=item.total_price)
+               for item in invoice.items]
+    )
+
+
+def _invoice_snapshots(invoice_ids):
+    """Snapshots of the invoices that still exist, in the order of `invoice_ids`"""
+    invoices = db.session.query(Invoice)\
+        .options(selectinload(Invoice.customer),
+                 selectinload(Invoice.items).selectinload(InvoiceItem.product),
+                 selectinload(Invoice.items).selectinload(InvoiceItem.service))\
+        .filter(Invoice.id.in_(invoice_ids))\
+        .all()
+    by_id = {invoice.id: invoice for invoice in invoices}
+    return [_snapshot(by_id[invoice_id]) for invoice_id in invoice_ids if invoice_id in by_id]
+
+
+def _cached_pdfs(invoice_ids):
+    """Yield (invoice_id, invoice_number, pdf_data) for the invoices already in the PDF cache"""
+    for offset in range(0, len(invoice_ids), CACHE_LOOKUP_BATCH):
+        batch = invoice_ids[offset:offset + CACHE_LOOKUP_BATCH]
+        rows = db.session.query(Invoice.id, Invoice.invoice_number, Invoice.status, Invoice.updated_at)\
+            .filter(Invoice.id.in_(batch))\
+            .all()
+        for row in rows:
+            path = cached_invoice_pdf(row)
+            if path is None:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    pdf_data = f.read()
+            except FileNotFoundError:
+                # Evicted since it was looked up; it gets rendered instead
+                continue
+            yield row.id, row.invoice_number, pdf_data
+
+
+class ZipStream(io.RawIOBase):
+    """Write-only sink that lets zipfile output be drained chunk by chunk"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_invoice_zip(invoice_ids, processes=None):
+    """Build a ZIP archive of invoice PDFs and yield it in chunks.
+
+    PDFs already in the PDF cache are copied in first; the rest are rendered
+    by a process pool started for this export and stopped when it ends. Each
+    PDF is written to the archive as soon as it is ready, so memory use stays
+    flat no matter how many invoices are exported.
+    """
+    sink = ZipStream()
+    failed = []
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        cached = set()
+        for invoice_id, invoice_number, pdf_data in _cached_pdfs(invoice_ids):
+            archive.writestr(f"invoice_{invoice_number}.pdf", pdf_data)
+            cached.add(invoice_id)
+            yield sink.drain()
+
+        uncached = [invoice_id for invoice_id in invoice_ids if invoice_id not in cached]
+        if uncached:
+            # spawn avoids inheriting the parent's database connections and
+            # threads; the workers only import the renderer
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(min(processes or EXPORT_PROCESSES, len(uncached))) as pool:
+                # Loaded a batch at a time, so only one batch of invoices
+                # is held in memory while it renders
+                for offset in range(0, len(uncached), EXPORT_BATCH_SIZE):
+                    batch = uncached[offset:offset + EXPORT_BATCH_SIZE]
+                    snapshots = _invoice_snapshots(batch)
+                    rendered = set()
+                    for invoice_id, invoice_number, pdf_data in pool.imap(render_invoice, snapshots,
+                                                                          chunksize=EXPORT_CHUNK_SIZE):
+                        if pdf_data is None:
+                            continue
+                        archive.writestr(f"invoice_{invoice_number}.pdf", pdf_data)
+                        rendered.add(invoice_id)
+                        yield sink.drain()
+
+                    for invoice_id in batch:
+                        if invoice_id not in rendered:
+                            logger.warning(f"Could not render invoice {invoice_id} for export")
+                            failed.append(str(invoice_id))
+
+        if failed:
+            archive.writestr('FAILED.txt', "Invoices that could not be rendered (ids):\n" + "\n".join(failed) + "\n")
+
+    yield sink.drain()
+
+
+@app.cli.command('export-invoices')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First issue date (inclusive).')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last issue date (inclusive).')
+@click.option('--status', type=click.Choice(['pending', 'paid', 'cancelled']), help='Only invoices with this status.')
+@click.option('--processes', type=int, default=None, help='Worker processes (default: EXPORT_PROCESSES or CPU count).')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), required=True, help='ZIP file to write.')
+def export_invoices_command(start, end, status, processes, output):
+    """Export invoice PDFs for a date range/status as a ZIP archive."""
+    invoice_ids = export_invoice_ids(start, end, status)
+    with open(output, 'wb') as f:
+        for chunk in stream_invoice_zip(invoice_ids, processes):
+            f.write(chunk)
+    print(f"Exported {len(invoice_ids)} invoices to {output}.")
@@ -0,0 +1,70 @@
+import time
+import logging
+import threading
+
+from app import app
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class StaleWhileRevalidateCache:
+    """Process-local cache for one expensive value.
+
+    Fresh values are served for `ttl` seconds. For a further `stale_ttl`
+    seconds the old value is still served immediately while a background
+    thread recomputes it. Past that, or after `invalidate()`, the next reader
+    recomputes synchronously. Each worker process keeps its own copy, so
+    writes handled by another worker become visible once the TTL runs out.
+    """
+
+    def __init__(self, loader, ttl=60, stale_ttl=300):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._value = None
+        self._loaded_at = None
+        self._generation = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            age = time.monotonic() - self._loaded_at if self._loaded_at is not None else None
+            if age is not None and age < self.ttl:
+                return self._value
+            if age is not None and age < self.ttl + self.stale_ttl:
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background,
+                                     args=(self._generation,), daemon=True).start()
+                return self._value
+            generation = self._generation
+
+        value = self.loader()
+        self._store(value, generation)
+        return value
+
+    def invalidate(self):
+        """Drop the cached value; the next reader recomputes it"""
+        with self._lock:
+            self._value = None
+            self._loaded_at = None
+            self._generation += 1
+
+    def _store(self, value, generation):
+        with self._lock:
+            # Don't resurrect a value computed before an invalidation
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = time.monotonic()
+
+    def _refresh_in_background(self, generation):
+        try:
+            with app.app_context():
+                self._store(self.loader(), generation)
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
@@ -0,0 +1,15 @@
+import logging
+
+from utils import generate_invoice_pdf
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Runs in the export render processes. It imports only the PDF renderer, not
+# the app or models, so a worker starts without booting the app or opening a
+# database connection; bulk_export hands it plain snapshots of the invoices.
+
+
+def render_invoice(invoice):
+    """Render an invoice snapshot; returns (invoice_id, invoice_number, pdf_data or None)"""
+    return invoice.id, invoice.invoice_number, generate_invoice_pdf(invoice)
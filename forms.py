@@ -29,6 +29,7 @@ class LoginForm(FlaskForm):
 class CategoryForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired(), Length(max=100)])
     description = TextAreaField('Description')
+    reorder_level = IntegerField('Reorder Level', validators=[NumberRange(min=0), Optional()])
     submit = SubmitField('Submit')
     
     def validate_name(self, name):
@@ -53,6 +54,7 @@ class ProductForm(FlaskForm):
     price = DecimalField('Sales Price', places=2, validators=[DataRequired(), NumberRange(min=0)])
     cost_price = DecimalField('Cost Price', places=2, validators=[NumberRange(min=0), Optional()])
     quantity = IntegerField('Quantity', validators=[DataRequired(), NumberRange(min=0)])
+    reorder_level = IntegerField('Reorder Level', validators=[NumberRange(min=0), Optional()])
     
     # Jewelry-specific attributes
     material = StringField('Material', validators=[Length(max=50), Optional()])
@@ -167,7 +169,8 @@ class ReportForm(FlaskForm):
         ('sales', 'Sales Report'),
         ('inventory', 'Inventory Report'),
         ('customers', 'Customer Report'),
-        ('services', 'Services Report')
+        ('services', 'Services Report'),
+        ('valuation', 'Stock Valuation')
     ], validators=[DataRequired()])
     start_date = DateField('Start Date', validators=[Optional()])
     end_date = DateField('End Date', validators=[Optional()])
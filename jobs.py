@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from app import app, db
+from models import Job
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Folder for finished job results (outside static/, results are private)
+JOB_RESULT_FOLDER = os.environ.get('JOB_RESULT_DIR', 'cache/jobs')
+# Worker threads per process
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# Finished jobs and their results are purged after this many days
+JOB_RETENTION_DAYS = 2
+# Seconds between heartbeats a process writes for the jobs it is running
+JOB_HEARTBEAT_INTERVAL = 60
+# A running job with no heartbeat for this long was left behind by a worker
+# that crashed or restarted, and is marked failed
+JOB_STALE_MINUTES = int(os.environ.get('JOB_STALE_MINUTES', 5))
+# Seconds between sweeps for stale and expired jobs
+JOB_HOUSEKEEPING_INTERVAL = 15 * 60
+
+os.makedirs(JOB_RESULT_FOLDER, exist_ok=True)
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+# Ids of the jobs this process is running, kept alive by its heartbeat
+_running = set()
+_running_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """Register a function as the handler for jobs of `kind`.
+
+    The handler receives the job's params dict and returns a
+    (filename, mimetype, data) tuple, where data is bytes or an iterable of
+    byte chunks. It runs in a worker thread inside an app context.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+            # Pick up work queued by a process that has since exited
+            for (job_id,) in db.session.query(Job.id).filter(Job.status == 'queued').all():
+                _executor.submit(_run_job, job_id)
+            _housekeeping()
+            threading.Thread(target=_housekeeping_loop, name='job-housekeeping', daemon=True).start()
+        return _executor
+
+
+def submit_job(kind, params, user_id=None):
+    """Persist a job and hand it to the local worker pool; returns the job id"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = Job(id=uuid.uuid4().hex, kind=kind, params=json.dumps(params), status='queued', created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+
+    _get_executor().submit(_run_job, job.id)
+    return job.id
+
+
+def _run_job(job_id):
+    with app.app_context():
+        # Claim the job; another worker may already have picked it up
+        now = datetime.utcnow()
+        claimed = Job.query.filter_by(id=job_id, status='queued').update(
+            {Job.status: 'running', Job.started_at: now, Job.heartbeat_at: now}, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return
+
+        job = db.session.get(Job, job_id)
+        kind, params = job.kind, json.loads(job.params or '{}')
+        path = os.path.join(JOB_RESULT_FOLDER, job_id)
+        with _running_lock:
+            _running.add(job_id)
+        try:
+            filename, mimetype, data = _handlers[kind](params)
+            with open(path, 'wb') as f:
+                if isinstance(data, bytes):
+                    f.write(data)
+                else:
+                    for chunk in data:
+                        f.write(chunk)
+
+            outcome = {Job.status: 'done', Job.result_path: path,
+                       Job.result_name: filename, Job.result_mimetype: mimetype}
+        except Exception as e:
+            db.session.rollback()
+            # Don't leave a streamed result half written
+            if os.path.exists(path):
+                os.remove(path)
+            logger.error(f"Job {job_id} ({kind}) failed: {str(e)}")
+            outcome = {Job.status: 'failed', Job.error: str(e)}
+        finally:
+            with _running_lock:
+                _running.discard(job_id)
+
+        # Only a job still marked running is ours to finish
+        outcome[Job.finished_at] = datetime.utcnow()
+        finished = Job.query.filter_by(id=job_id, status='running').update(
+            outcome, synchronize_session=False)
+        db.session.commit()
+        if not finished:
+            logger.warning(f"Job {job_id} ({kind}) was marked failed before it finished")
+            if os.path.exists(path):
+                os.remove(path)
+        db.session.remove()
+
+
+def _heartbeat():
+    """Tell other processes the jobs running here are still alive"""
+    with _running_lock:
+        job_ids = list(_running)
+    if not job_ids:
+        return
+    Job.query.filter(Job.id.in_(job_ids), Job.status == 'running').update(
+        {Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+
+def _fail_stale_jobs():
+    """Fail jobs left 'running' by a worker that died before finishing them"""
+    cutoff = datetime.utcnow() - timedelta(minutes=JOB_STALE_MINUTES)
+    # Jobs started before heartbeats were recorded only have started_at
+    last_seen = func.coalesce(Job.heartbeat_at, Job.started_at)
+    stale = Job.query.filter(Job.status == 'running', last_seen < cutoff).update({
+        Job.status: 'failed',
+        Job.error: 'The worker running this job stopped before it finished',
+        Job.finished_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    if stale:
+        logger.warning(f"Marked {stale} stale running job(s) as failed")
+
+
+def _purge_old_jobs():
+    cutoff = datetime.utcnow() - timedelta(days=JOB_RETENTION_DAYS)
+    old_jobs = Job.query.filter(Job.status.in_(['done', 'failed']), Job.finished_at < cutoff).all()
+    for job in old_jobs:
+        # Another process may be purging the same jobs
+        if job.result_path:
+            try:
+                os.remove(job.result_path)
+            except FileNotFoundError:
+                pass
+        db.session.delete(job)
+    db.session.commit()
+
+
+def _housekeeping():
+    try:
+        _fail_stale_jobs()
+        _purge_old_jobs()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Job housekeeping failed: {str(e)}")
+
+
+def _housekeeping_loop():
+    last_sweep = time.monotonic()
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        with app.app_context():
+            try:
+                _heartbeat()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Job heartbeat failed: {str(e)}")
+            if time.monotonic() - last_sweep >= JOB_HOUSEKEEPING_INTERVAL:
+                _housekeeping()
+                last_sweep = time.monotonic()
+            db.session.remove()
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
@@ -0,0 +1,176 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import event, func, insert, select, update, literal
+from sqlalchemy.orm import Session
+
+from app import app, db
+from models import Product, StockMovement, StockCheckpoint, StockCheckpointItem
+from valuation import record_stock_change
+from reorder import refresh_products
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+MOVEMENT_KINDS = ('sale', 'return', 'receipt', 'adjustment', 'transfer')
+
+
+class StockMovementError(ValueError):
+    """Raised for a movement that can't be applied, e.g. one that would take stock below zero"""
+
+
+def _current_user_id():
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def record_movements(kind, quantities, invoice_id=None, note=None):
+    """Append ledger rows for changes already made to Product.quantity.
+
+    `quantities` maps product ids to signed changes in pieces. Must be
+    called inside the transaction that changed the stock.
+    """
+    if kind not in MOVEMENT_KINDS:
+        raise StockMovementError(f"Unknown stock movement kind: {kind}")
+    rows = [{
+        'product_id': product_id,
+        'kind': kind,
+        'quantity': quantity,
+        'invoice_id': invoice_id,
+        'note': note,
+        'created_by': _current_user_id(),
+        'created_at': datetime.utcnow()
+    } for product_id, quantity in quantities.items() if quantity]
+    if rows:
+        # Core insert on the session's connection, so this also works mid-flush
+        db.session.connection().execute(insert(StockMovement.__table__), rows)
+
+
+def move_stock(product, kind, quantity, invoice_id=None, note=None):
+    """Change a product's stock by `quantity` pieces and record why.
+
+    The change is a relative update guarded against going below zero, so
+    concurrent movements can't lose each other's pieces.
+    """
+    if not quantity:
+        raise StockMovementError("Quantity must not be zero")
+
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == product.id, Product.quantity + quantity >= 0)
+        .values(quantity=Product.quantity + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        raise StockMovementError(f"Not enough stock of {product.name} to remove {-quantity}")
+
+    record_stock_change({product.id: product}, {product.id: quantity}, sign=1)
+    record_movements(kind, {product.id: quantity}, invoice_id=invoice_id, note=note)
+    refresh_products([product.id])
+    db.session.expire(product, ['quantity'])
+
+
+# Quantity changes made through the ORM (new, edited and deleted products)
+# are recorded automatically: receipts for new stock, adjustments otherwise
+@event.listens_for(Session, 'before_flush')
+def _collect_quantity_changes(session, flush_context, instances):
+    created, changed = [], defaultdict(int)
+    for product in session.new:
+        if isinstance(product, Product):
+            created.append(product)
+    for product in session.dirty:
+        if isinstance(product, Product):
+            history = db.inspect(product).attrs.quantity.history
+            if history.has_changes():
+                old = history.deleted[0] if history.deleted else 0
+                changed[product.id] += (product.quantity or 0) - (old or 0)
+    for product in session.deleted:
+        if isinstance(product, Product):
+            changed[product.id] -= product.quantity or 0
+    session.info['stock_changes'] = (created, changed)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_quantity_changes(session, flush_context):
+    created, changed = session.info.pop('stock_changes', ((), {}))
+    receipts = {product.id: product.quantity or 0 for product in created}
+    if receipts:
+        record_movements('receipt', receipts, note='New product')
+    if changed:
+        record_movements('adjustment', changed)
+
+
+def stock_as_of(moment, product_ids=None):
+    """Pieces in stock per product id at `moment` (a naive UTC datetime).
+
+    Starts from the newest checkpoint at or before `moment` and adds the
+    ledger rows written after it, so the work done is one checkpoint read
+    plus the movements since. Returns (checkpoint time, {product_id: pieces}),
+    or (None, None) when there is no checkpoint that early.
+    """
+    checkpoint = db.session.scalars(select(StockCheckpoint)
+                                    .where(StockCheckpoint.checkpoint_at <= moment)
+                                    .order_by(StockCheckpoint.checkpoint_at.desc())
+                                    .limit(1)).first()
+    if checkpoint is None:
+        return None, None
+
+    items = select(StockCheckpointItem.product_id, StockCheckpointItem.quantity)\
+        .where(StockCheckpointItem.checkpoint_id == checkpoint.id)
+    movements = select(StockMovement.product_id, func.sum(StockMovement.quantity))\
+        .where(StockMovement.id > checkpoint.last_movement_id, StockMovement.created_at <= moment)
+    if product_ids is not None:
+        items = items.where(StockCheckpointItem.product_id.in_(product_ids))
+        movements = movements.where(StockMovement.product_id.in_(product_ids))
+
+    stock = dict(db.session.execute(items).all())
+    for product_id, quantity in db.session.execute(movements.group_by(StockMovement.product_id)):
+        stock[product_id] = stock.get(product_id, 0) + quantity
+
+    return checkpoint.checkpoint_at, {product_id: quantity for product_id, quantity in stock.items() if quantity}
+
+
+def take_checkpoint():
+    """Store every product's current stock against the newest ledger row"""
+    try:
+        checkpoint = StockCheckpoint(checkpoint_at=datetime.utcnow())
+        db.session.add(checkpoint)
+        db.session.flush()
+
+        # Stock changes and their ledger rows are written in one transaction
+        # that holds the product row. Locking every product (on SQLite, the
+        # write above already holds the database lock) waits out the ones in
+        # flight and holds off new ones until this commits, so no movement
+        # at or below the watermark can still be uncommitted, and none can
+        # land between reading the watermark and copying the quantities.
+        db.session.execute(select(Product.id).with_for_update(read=True)).all()
+        checkpoint.last_movement_id = db.session.scalar(select(func.coalesce(func.max(StockMovement.id), 0)))
+        db.session.flush()
+
+        db.session.execute(insert(StockCheckpointItem).from_select(
+            ['checkpoint_id', 'product_id', 'quantity'],
+            select(literal(checkpoint.id), Product.id, Product.quantity).where(Product.quantity != 0)
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error taking stock checkpoint: {str(e)}")
+        raise
+
+    return checkpoint.checkpoint_at
+
+
+def end_of_day(day):
+    """The last moment of `day`, for "stock on 31 March" style questions"""
+    return datetime.combine(day, datetime.min.time()) + timedelta(days=1) - timedelta(microseconds=1)
+
+
+@app.cli.command('checkpoint-stock')
+def checkpoint_stock_command():
+    """Checkpoint current stock so point-in-time queries replay only newer movements (run nightly)."""
+    checkpoint_at = take_checkpoint()
+    print(f"Stored stock checkpoint at {checkpoint_at:%Y-%m-%d %H:%M:%S} UTC.")
@@ -0,0 +1,8 @@
+from main import app
+
+# Commands for running by hand that the web workers never need; they are
+# only registered here, so gunicorn's main:app doesn't import them:
+#   flask --app manage benchmark-reports
+#   flask --app manage benchmark-invoice-pdf
+import report_benchmark
+import pdf_benchmark
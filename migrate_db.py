@@ -1,37 +1,225 @@
-import os
 import logging
+from datetime import datetime
+
+from sqlalchemy import text, inspect, insert, select
+
 from app import app, db
-from sqlalchemy import text
+from models import SchemaRevision, Product, Category, Customer, Job
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_migrations():
-    """Run database migrations manually"""
-    try:
-        with app.app_context():
-            connection = db.engine.connect()
-            transaction = connection.begin()
+# Numbered, forward-only schema revisions, applied in order and recorded in
+# schema_revision. Tables are created from the current models, so every
+# later revision checks before it alters anything: a new database and an
+# upgraded one end up with the same schema, and a revision that failed
+# halfway (MySQL commits each DDL statement) can simply be run again.
+REVISIONS = []
 
-            try:
-                # All table creation is handled by SQLAlchemy's create_all()
-                db.create_all()
-                logger.info("Database tables created successfully!")
 
-                transaction.commit()
-                logger.info("Database migration completed successfully!")
+def revision(number, name):
+    """Register `function(connection)` as schema revision `number`"""
+    def register(function):
+        if REVISIONS and number <= REVISIONS[-1][0]:
+            raise ValueError(f"Schema revision {number} must come after {REVISIONS[-1][0]}")
+        REVISIONS.append((number, name, function))
+        return function
+    return register
+
+
+def add_column(connection, column):
+    """Add a model column to its table unless it is already there.
+
+    New columns are nullable; on MySQL the ALTER runs in place without
+    locking the table against reads or writes.
+    """
+    table = column.table.name
+    if column.name in {c['name'] for c in inspect(connection).get_columns(table)}:
+        return False
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=connection.dialect)}"
+    if connection.dialect.name == 'mysql':
+        ddl += ", ALGORITHM=INPLACE, LOCK=NONE"
+    logger.info(f"Adding column {table}.{column.name}")
+    connection.execute(text(ddl))
+    return True
+
+
+def create_index(connection, name, table, columns):
+    """Create an index unless one with that name, or one leading with the same columns, exists.
+
+    MySQL builds it online (ALGORITHM=INPLACE, LOCK=NONE), so sales keep
+    being recorded while a large table is indexed. Foreign key indexes MySQL
+    created on its own count as existing ones.
+    """
+    for index in inspect(connection).get_indexes(table):
+        if index['name'] == name or index['column_names'][:len(columns)] == list(columns):
+            return False
+    logger.info(f"Creating index {name} on {table} ({', '.join(columns)})")
+    if connection.dialect.name == 'mysql':
+        connection.execute(text(
+            f"ALTER TABLE {table} ADD INDEX {name} ({', '.join(columns)}), ALGORITHM=INPLACE, LOCK=NONE"))
+    else:
+        connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+    return True
+
+
+@revision(1, 'Create missing tables')
+def create_missing_tables(connection):
+    # Existing tables are left alone; schema.sql's legacy customers, inventory,
+    # sales and users tables are not used by the app and are not dropped
+    db.metadata.create_all(connection)
+
+
+@revision(2, 'Customer search keys')
+def add_customer_search_keys(connection):
+    """Add and backfill the normalized customer name/phone keys used by the typeahead"""
+    from models import normalize_name, normalize_phone
+
+    add_column(connection, Customer.__table__.c.name_key)
+    add_column(connection, Customer.__table__.c.phone_key)
+    create_index(connection, 'ix_customer_name_key', 'customer', ['name_key'])
+    create_index(connection, 'ix_customer_phone_key', 'customer', ['phone_key'])
+
+    rows = connection.execute(text("SELECT id, name, phone FROM customer WHERE name_key IS NULL")).all()
+    for customer_id, name, phone in rows:
+        connection.execute(
+            text("UPDATE customer SET name_key = :name_key, phone_key = :phone_key WHERE id = :id"),
+            {'name_key': normalize_name(name)[:100], 'phone_key': normalize_phone(phone) or None, 'id': customer_id}
+        )
+    logger.info(f"Backfilled search keys for {len(rows)} customers")
+
+
+@revision(3, 'Reorder levels')
+def add_reorder_levels(connection):
+    add_column(connection, Product.__table__.c.reorder_level)
+    add_column(connection, Category.__table__.c.reorder_level)
+
+
+@revision(4, 'Indexes for dashboard, ledger and report filters')
+def add_filter_indexes(connection):
+    # Paid invoices in a date range: dashboard totals and top products, the
+    # ledger's status filter, the customers report
+    create_index(connection, 'ix_invoice_status_issue_date', 'invoice', ['status', 'issue_date'])
+    # Date range alone: ledger and export filters, rollup rebuilds
+    create_index(connection, 'ix_invoice_issue_date', 'invoice', ['issue_date'])
+    # The dashboard's recent invoices
+    create_index(connection, 'ix_invoice_created_at', 'invoice', ['created_at'])
+    # Sales per product: top products, recently sold items, delete checks
+    create_index(connection, 'ix_invoice_item_product_id', 'invoice_item', ['product_id'])
+    # Inventory stock and category filters, category reorder level changes
+    create_index(connection, 'ix_product_quantity', 'product', ['quantity'])
+    create_index(connection, 'ix_product_category_id', 'product', ['category_id'])
+
+
+@revision(5, 'Product search index')
+def add_product_search_index(connection):
+    """Create the FULLTEXT index (MySQL) or FTS5 table and its triggers (SQLite) used by search.py"""
+    from search import SEARCH_BACKENDS, SEARCH_COLUMNS
+
+    backend = SEARCH_BACKENDS.get(connection.dialect.name)
+    if backend is None or backend().index_exists(connection):
+        return
+
+    columns = ', '.join(SEARCH_COLUMNS)
+    if connection.dialect.name == 'mysql':
+        # InnoDB can't build a FULLTEXT index with LOCK=NONE: writes to
+        # product wait while it is built, so run this outside busy hours
+        logger.info("Creating FULLTEXT index for product search")
+        connection.execute(text(
+            f"ALTER TABLE product ADD FULLTEXT INDEX {backend.INDEX_NAME} ({columns}), "
+            f"ALGORITHM=INPLACE, LOCK=SHARED"))
+        return
 
+    logger.info("Creating FTS5 table for product search")
+    new_values = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE product_fts USING fts5({columns}, content='product', content_rowid='id')"))
+    connection.execute(text(
+        f"CREATE TRIGGER product_fts_insert AFTER INSERT ON product BEGIN "
+        f"INSERT INTO product_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"))
+    connection.execute(text(
+        f"CREATE TRIGGER product_fts_delete AFTER DELETE ON product BEGIN "
+        f"INSERT INTO product_fts(product_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"))
+    connection.execute(text(
+        f"CREATE TRIGGER product_fts_update AFTER UPDATE ON product BEGIN "
+        f"INSERT INTO product_fts(product_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO product_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"))
+    connection.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+
+
+@revision(6, 'Inventory valuation backfill')
+def backfill_inventory_valuation(connection):
+    """Seed the running inventory valuation from current stock; product writes keep it up to date after this"""
+    from valuation import fill_inventory_valuation
+
+    fill_inventory_valuation(connection)
+
+
+@revision(7, 'Low stock backfill')
+def backfill_low_stock(connection):
+    """Flag the products already below their reorder level; stock changes keep the set current after this"""
+    from reorder import fill_low_stock
+
+    fill_low_stock(connection)
+
+
+@revision(8, 'Job heartbeats')
+def add_job_heartbeats(connection):
+    add_column(connection, Job.__table__.c.heartbeat_at)
+
+
+def applied_revisions(connection):
+    if not inspect(connection).has_table(SchemaRevision.__tablename__):
+        return set()
+    return set(connection.scalars(select(SchemaRevision.revision)))
+
+
+def pending_revisions():
+    """(number, name) of every revision not yet applied to the database"""
+    with db.engine.connect() as connection:
+        applied = applied_revisions(connection)
+    return [(number, name) for number, name, _ in REVISIONS if number not in applied]
+
+
+def run_migrations():
+    """Apply every pending revision in order, each in its own transaction"""
+    with app.app_context():
+        SchemaRevision.__table__.create(db.engine, checkfirst=True)
+        with db.engine.connect() as connection:
+            applied = applied_revisions(connection)
+
+        for number, name, upgrade in REVISIONS:
+            if number in applied:
+                continue
+            logger.info(f"Applying schema revision {number}: {name}")
+            try:
+                with db.engine.begin() as connection:
+                    upgrade(connection)
+                    connection.execute(insert(SchemaRevision).values(
+                        revision=number, name=name, applied_at=datetime.utcnow()))
             except Exception as e:
-                transaction.rollback()
-                logger.error(f"Error during migration: {str(e)}")
+                logger.error(f"Schema revision {number} failed: {str(e)}")
                 raise
-            finally:
-                connection.close()
 
-    except Exception as e:
-        logger.error(f"Database migration failed: {str(e)}")
-        raise
+        logger.info("Database migration completed successfully!")
+
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema revisions."""
+    run_migrations()
+
+
+@app.cli.command('db-revisions')
+def db_revisions_command():
+    """List schema revisions and whether each has been applied."""
+    with db.engine.connect() as connection:
+        applied = applied_revisions(connection)
+    for number, name, _ in REVISIONS:
+        print(f"{number:>4}  {'applied' if number in applied else 'pending':<8} {name}")
+
 
 if __name__ == "__main__":
     run_migrations()
-    print("Database migration completed.")
\ No newline at end of file
+    print("Database migration completed.")
@@ -3,6 +3,7 @@ import sys
 import pymysql
 from app import app, db
 from models import Product
+from barcode_allocator import allocate_barcodes
 
 def migrate_sku_to_barcode():
     """
@@ -73,14 +74,10 @@ def migrate_sku_to_barcode():
             cursor.execute("SELECT id, barcode FROM product")
             products = cursor.fetchall()
             
-            # Start with barcode 10000
-            next_barcode = 10000
+            # Reserve one barcode per product from the shared barcode sequence
+            barcodes = allocate_barcodes(len(products))
             
-            for product_id, current_barcode in products:
-                # Generate a new 5-digit barcode
-                barcode = str(next_barcode).zfill(5)
-                next_barcode += 1
-                
+            for (product_id, current_barcode), barcode in zip(products, barcodes):
                 # Update the product with the new barcode
                 cursor.execute(
                     "UPDATE product SET barcode = %s WHERE id = %s", 
@@ -1,9 +1,34 @@
+import re
+import unicodedata
 from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from app import db, login_manager
 
+def normalize_phone(phone):
+    """Digits only, without the +91 country code or a trunk 0.
+
+    Stored phone keys and typed (possibly partial) phone searches both go
+    through this, so "+91 98765 43210", "098765 43210" and "9876543210" all
+    match, as do "022-1234567" and "221234567". A 91 is only taken for the
+    country code when written as +91/0091 or in front of a full number.
+    """
+    phone = (phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    international = phone.startswith('+') or digits.startswith('00')
+    digits = digits.lstrip('0')
+    if digits.startswith('91') and (international or len(digits) > 10):
+        digits = digits[2:]
+    return digits.lstrip('0')
+
+def normalize_name(name):
+    """Lowercase, accent-free, single-spaced name for prefix lookups"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -29,6 +54,7 @@ class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text)
+    reorder_level = db.Column(db.Integer)  # default for its products; None falls back to reorder.DEFAULT_REORDER_LEVEL
     products = db.relationship('Product', backref='category', lazy=True)
     
     def __repr__(self):
@@ -53,7 +79,8 @@ class Product(db.Model):
     barcode = db.Column(db.String(5), unique=True)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     cost_price = db.Column(db.Numeric(10, 2))
-    quantity = db.Column(db.Integer, default=0)
+    quantity = db.Column(db.Integer, default=0, index=True)
+    reorder_level = db.Column(db.Integer)  # stock below this is low; None uses the category's level
     
     # Jewelry-specific attributes
     material = db.Column(db.String(50))
@@ -66,7 +93,7 @@ class Product(db.Model):
     size = db.Column(db.String(20))  # For rings, bracelets, etc.
     
     # Foreign keys and timestamps
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), index=True)
     supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -90,17 +117,34 @@ class Customer(db.Model):
     bracelet_size = db.Column(db.String(10))
     necklace_length = db.Column(db.String(10))
     
+    # Normalized copies of name and phone, indexed for typeahead lookups
+    name_key = db.Column(db.String(100), index=True)
+    phone_key = db.Column(db.String(20), index=True)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     invoices = db.relationship('Invoice', backref='customer', lazy=True)
     
+    @validates('name')
+    def _set_name_key(self, key, name):
+        self.name_key = normalize_name(name)[:100]
+        return name
+    
+    @validates('phone')
+    def _set_phone_key(self, key, phone):
+        self.phone_key = normalize_phone(phone) or None
+        return phone
+    
     def __repr__(self):
         return f'<Customer {self.name}>'
 
 class Invoice(db.Model):
+    # Dashboard, ledger and report filters are a status plus an issue date range
+    __table_args__ = (db.Index('ix_invoice_status_issue_date', 'status', 'issue_date'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
-    issue_date = db.Column(db.DateTime, default=datetime.utcnow)
+    issue_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     due_date = db.Column(db.DateTime)
     
     # Financial information
@@ -122,7 +166,7 @@ class Invoice(db.Model):
     payment_method = db.Column(db.String(50))  # cash, credit, debit, etc.
     notes = db.Column(db.Text)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     items = db.relationship('InvoiceItem', backref='invoice', lazy=True, cascade='all, delete-orphan')
     
@@ -132,7 +176,7 @@ class Invoice(db.Model):
 class InvoiceItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Numeric(10, 2), nullable=False)
     total_price = db.Column(db.Numeric(10, 2), nullable=False)
@@ -165,3 +209,167 @@ class JewelryService(db.Model):
     
     def __repr__(self):
         return f'<JewelryService {self.name}>'
+
+# Per-day, per-status invoice totals maintained alongside invoice writes
+class DailySales(db.Model):
+    __tablename__ = 'daily_sales'
+    __table_args__ = (db.UniqueConstraint('sales_date', 'status', name='uq_daily_sales_date_status'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sales_date = db.Column(db.Date, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    tax_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    discount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailySales {self.sales_date} {self.status}>'
+
+# Per-day, per-status, per-service totals of service lines, maintained like DailySales
+class DailyServiceSales(db.Model):
+    __tablename__ = 'daily_service_sales'
+    __table_args__ = (db.UniqueConstraint('sales_date', 'status', 'service_id', name='uq_daily_service_sales'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    sales_date = db.Column(db.Date, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False)
+    service_id = db.Column(db.Integer, db.ForeignKey('jewelry_service.id'), nullable=False, index=True)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    service_count = db.Column(db.Integer, nullable=False, default=0)
+    deposit_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    # Sum of (estimated ready date - issue date) over lines that have one, for averages
+    turnaround_days = db.Column(db.Integer, nullable=False, default=0)
+    turnaround_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyServiceSales {self.sales_date} {self.status} {self.service_id}>'
+
+# Running stock totals per category, metal and purity, maintained by valuation.py.
+# Missing values are stored as 0 / '' so each bucket has exactly one row.
+class InventoryValuation(db.Model):
+    __tablename__ = 'inventory_valuation'
+    __table_args__ = (db.UniqueConstraint('category_id', 'metal_type', 'purity', name='uq_inventory_valuation'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, nullable=False, default=0)
+    metal_type = db.Column(db.String(50), nullable=False, default='')
+    purity = db.Column(db.String(20), nullable=False, default='')
+    units = db.Column(db.Integer, nullable=False, default=0)
+    retail_value = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    cost_value = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    gross_weight = db.Column(db.Numeric(14, 3), nullable=False, default=0)  # grams
+
+    def __repr__(self):
+        return f'<InventoryValuation {self.category_id} {self.metal_type} {self.purity}>'
+
+# Copies of inventory_valuation taken by `flask snapshot-inventory-valuation`
+class InventoryValuationSnapshot(db.Model):
+    __tablename__ = 'inventory_valuation_snapshot'
+    __table_args__ = (db.UniqueConstraint('snapshot_date', 'category_id', 'metal_type', 'purity',
+                                          name='uq_inventory_valuation_snapshot'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, nullable=False, index=True)
+    category_id = db.Column(db.Integer, nullable=False, default=0)
+    metal_type = db.Column(db.String(50), nullable=False, default='')
+    purity = db.Column(db.String(20), nullable=False, default='')
+    units = db.Column(db.Integer, nullable=False, default=0)
+    retail_value = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    cost_value = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    gross_weight = db.Column(db.Numeric(14, 3), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<InventoryValuationSnapshot {self.snapshot_date} {self.category_id}>'
+
+# Append-only record of every change to Product.quantity, written by ledger.py.
+# product_id is not a foreign key so the history outlives deleted products.
+class StockMovement(db.Model):
+    __tablename__ = 'stock_movement'
+    __table_args__ = (db.Index('ix_stock_movement_product_created', 'product_id', 'created_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # sale, return, receipt, adjustment, transfer
+    quantity = db.Column(db.Integer, nullable=False)  # signed change in pieces
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'))
+    note = db.Column(db.String(255))
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<StockMovement {self.kind} {self.product_id} {self.quantity:+d}>'
+
+# A snapshot of stock as of a ledger position, taken by `flask checkpoint-stock`
+class StockCheckpoint(db.Model):
+    __tablename__ = 'stock_checkpoint'
+
+    id = db.Column(db.Integer, primary_key=True)
+    checkpoint_at = db.Column(db.DateTime, nullable=False, unique=True)
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)  # ledger rows up to this id are included
+    items = db.relationship('StockCheckpointItem', backref='checkpoint', lazy=True)
+
+    def __repr__(self):
+        return f'<StockCheckpoint {self.checkpoint_at} up to movement {self.last_movement_id}>'
+
+# Pieces on hand per product in a checkpoint; products missing from it had none
+class StockCheckpointItem(db.Model):
+    __tablename__ = 'stock_checkpoint_item'
+
+    checkpoint_id = db.Column(db.Integer, db.ForeignKey('stock_checkpoint.id'), primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # no FK: history outlives products
+    quantity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<StockCheckpointItem {self.checkpoint_id} {self.product_id}={self.quantity}>'
+
+# Products currently below their reorder level, maintained by reorder.py on
+# every stock change so the dashboard and reorder list never scan the catalogue
+class LowStock(db.Model):
+    __tablename__ = 'low_stock'
+
+    product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # no FK: rows go when the product does
+    flagged_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<LowStock {self.product_id}>'
+
+# Revisions applied by migrate_db.py, one row per revision number
+class SchemaRevision(db.Model):
+    __tablename__ = 'schema_revision'
+    
+    revision = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SchemaRevision {self.revision} {self.name}>'
+
+# Named counters handed out in blocks by sequences.BlockAllocator
+class NumberSequence(db.Model):
+    __tablename__ = 'number_sequence'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
+    
+    def __repr__(self):
+        return f'<NumberSequence {self.name}={self.next_value}>'
+
+# Background work queued through jobs.submit_job
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    result_path = db.Column(db.String(255))
+    result_name = db.Column(db.String(255))
+    result_mimetype = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # refreshed while a worker is running it
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
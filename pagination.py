@@ -0,0 +1,65 @@
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query.
+
+    Cursors are the key column value of the last/first row on the page, so the
+    next page is a plain indexed range scan instead of an OFFSET.
+    """
+
+    def __init__(self, items, key, has_next, has_prev):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = getattr(items[-1], key) if items and has_next else None
+        self.prev_cursor = getattr(items[0], key) if items and has_prev else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def clamp_per_page(value, default=DEFAULT_PER_PAGE):
+    """Clamp a user supplied page size to a sane range"""
+    if not value or value < 1:
+        return default
+    return min(value, MAX_PER_PAGE)
+
+
+def keyset_paginate(query, column, after=None, before=None, per_page=DEFAULT_PER_PAGE, descending=False):
+    """Fetch one page of `query` ordered by `column`.
+
+    `after` returns the page following that key, `before` the page preceding
+    it. Only `per_page + 1` rows are ever read, regardless of table size.
+    """
+    forward = before is None or after is not None
+
+    if after is not None:
+        query = query.filter(column < after if descending else column > after)
+    elif before is not None:
+        query = query.filter(column > before if descending else column < before)
+
+    # Walking backwards means scanning in the opposite direction and flipping the result
+    scan_ascending = forward != descending
+    query = query.order_by(column.asc() if scan_ascending else column.desc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if forward:
+        has_next, has_prev = has_more, after is not None
+    else:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+
+    return KeysetPage(rows, column.key, has_next, has_prev)
@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from statistics import mean
+
+import click
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+
+import utils
+from app import app, db
+from models import Product, Customer, Invoice, InvoiceItem
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def _seed(items):
+    """Add an invoice with `items` lines in the current transaction"""
+    customer = Customer(name='Benchmark customer', email='benchmark@example.com',
+                        phone='98765 43210', address='1 Benchmark Road')
+    products = [Product(name=f'Benchmark product {i}', price=Decimal(1000 + i), quantity=1)
+                for i in range(items)]
+    total = sum(product.price for product in products)
+    invoice = Invoice(invoice_number='BENCH-PDF', customer=customer, issue_date=datetime.utcnow(),
+                      total_amount=total, tax_amount=total * Decimal('0.03'), discount=Decimal(0),
+                      final_amount=total * Decimal('1.03'), status='paid')
+    invoice.items = [InvoiceItem(product=product, quantity=1, unit_price=product.price,
+                                 total_price=product.price) for product in products]
+    db.session.add(invoice)
+    db.session.flush()
+    return invoice
+
+
+def _previous_watermark(canvas, doc):
+    """The previous page callback: find the logo and draw it full size on every page"""
+    canvas.saveState()
+    logo_file = next((path for path in utils.LOGO_PATHS if os.path.exists(path)), None)
+    if logo_file:
+        page_width, page_height = A4
+        canvas.setFillAlpha(0.25)
+        canvas.drawImage(logo_file, x=(page_width - 450) / 2, y=(page_height - 450) / 2,
+                         width=450, height=450, mask='auto', preserveAspectRatio=True)
+    canvas.restoreState()
+
+
+@contextmanager
+def _previous_renderer():
+    """Render the way invoices were before the rendering context was shared:
+    styles built per invoice, the full-size logo re-read for every page and
+    image streams ASCII85 encoded"""
+    watermark, styles, use_a85 = utils.add_watermark, utils.INVOICE_STYLES, rl_config.useA85
+    utils.add_watermark, rl_config.useA85 = _previous_watermark, 1
+    try:
+        yield _render_with_fresh_styles
+    finally:
+        utils.add_watermark, utils.INVOICE_STYLES, rl_config.useA85 = watermark, styles, use_a85
+
+
+def _render_with_fresh_styles(invoice):
+    utils.INVOICE_STYLES = utils._build_invoice_styles()
+    return utils.generate_invoice_pdf(invoice)
+
+
+@contextmanager
+def _current_renderer():
+    yield utils.generate_invoice_pdf
+
+
+def _measure(render, invoice, repeat):
+    """Best and mean render time in milliseconds, and the PDF size in KB"""
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        pdf = render(invoice)
+        timings.append((time.perf_counter() - began) * 1000)
+    return min(timings), mean(timings), len(pdf) / 1024
+
+
+@app.cli.command('benchmark-invoice-pdf')
+@click.option('--items', default=10, help='Lines on the benchmark invoice')
+@click.option('--repeat', default=20, help='Renders per renderer')
+def benchmark_invoice_pdf_command(items, repeat):
+    """Time rendering an invoice PDF with the previous and current renderers.
+
+    The invoice is seeded inside a transaction that is rolled back at the
+    end, so the command leaves the database as it found it.
+    """
+    try:
+        invoice = _seed(items)
+        print(f"{'renderer':<10} {'best ms':>9} {'mean ms':>9} {'size KB':>9}")
+        for name, renderer in (('previous', _previous_renderer), ('current', _current_renderer)):
+            with renderer() as render:
+                render(invoice)  # warm-up: fonts, images, first-use imports
+                best_ms, mean_ms, size_kb = _measure(render, invoice, repeat)
+            print(f"{name:<10} {best_ms:>9.1f} {mean_ms:>9.1f} {size_kb:>9.0f}")
+    finally:
+        db.session.rollback()
@@ -0,0 +1,116 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+
+from utils import generate_invoice_pdf, PDF_RENDERER_VERSION
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Folder for cached invoice PDFs (outside static/, invoices are private)
+PDF_CACHE_FOLDER = os.environ.get('PDF_CACHE_DIR', 'cache/invoice_pdfs')
+# Paid invoices don't change, so their PDFs are kept here and never evicted;
+# one is deleted when its invoice stops being paid
+FROZEN_FOLDER = os.path.join(PDF_CACHE_FOLDER, 'frozen')
+# Upper bound for the evictable part of the cache
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+os.makedirs(FROZEN_FOLDER, exist_ok=True)
+
+_eviction_lock = threading.Lock()
+
+
+def pdf_cache_key(invoice):
+    """Content key for an invoice PDF; changes whenever the invoice or renderer does"""
+    updated = invoice.updated_at.isoformat() if invoice.updated_at else ''
+    source = f"{invoice.id}:{updated}:{PDF_RENDERER_VERSION}"
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _cache_path(invoice, key):
+    folder = FROZEN_FOLDER if invoice.status == 'paid' else PDF_CACHE_FOLDER
+    return os.path.join(folder, f"{key}.pdf")
+
+
+def _write_atomically(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _evict():
+    """Delete least recently used PDFs until the cache fits its size limit"""
+    with _eviction_lock:
+        entries = []
+        total = 0
+        for entry in os.scandir(PDF_CACHE_FOLDER):
+            if entry.is_file() and entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= PDF_CACHE_MAX_BYTES:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= PDF_CACHE_MAX_BYTES:
+                break
+
+
+def discard_frozen_pdf(invoice):
+    """Delete a paid invoice's PDF; call before its status changes from paid"""
+    if invoice.status != 'paid':
+        return
+    try:
+        os.remove(_cache_path(invoice, pdf_cache_key(invoice)))
+    except FileNotFoundError:
+        pass
+
+
+def cached_invoice_pdf(invoice):
+    """Path of the invoice's cached PDF, or None if it isn't cached.
+
+    Only reads the invoice's id, status and updated_at, so a query row with
+    those columns will do.
+    """
+    path = _cache_path(invoice, pdf_cache_key(invoice))
+    try:
+        # Mark as recently used for LRU eviction
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        return None
+
+
+def get_invoice_pdf(invoice):
+    """Return (path, etag) for the invoice PDF, rendering it on a cache miss.
+
+    Returns (None, None) if rendering fails.
+    """
+    key = pdf_cache_key(invoice)
+    path = cached_invoice_pdf(invoice)
+    if path:
+        return path, key
+
+    path = _cache_path(invoice, key)
+    pdf_data = generate_invoice_pdf(invoice)
+    if pdf_data is None:
+        return None, None
+
+    _write_atomically(path, pdf_data)
+    if invoice.status != 'paid':
+        _evict()
+    return path, key
@@ -0,0 +1,83 @@
+import logging
+
+from app import db
+from models import Product, Category
+from cache import StaleWhileRevalidateCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The index is rebuilt in the background after this many seconds so edits
+# made by other worker processes show up; edits in this process invalidate it
+PRODUCT_INDEX_TTL = 60
+PRODUCT_INDEX_STALE_TTL = 600
+
+# Most codes resolved in one batch request
+MAX_BATCH_BARCODES = 200
+
+
+def _product_entry(product_id, barcode, name, price, category):
+    return {
+        'id': product_id,
+        'barcode': barcode,
+        'name': name,
+        'price': float(price),
+        'category': category
+    }
+
+
+def _barcode_rows(codes=None):
+    query = db.session.query(Product.id, Product.barcode, Product.name, Product.price, Category.name)\
+        .outerjoin(Category, Product.category_id == Category.id)\
+        .filter(Product.barcode.isnot(None))
+    if codes is not None:
+        query = query.filter(Product.barcode.in_(codes))
+    return query.all()
+
+
+def _load_barcode_index():
+    index = {row[1]: _product_entry(*row) for row in _barcode_rows()}
+    logger.info(f"Loaded barcode index with {len(index)} products")
+    return index
+
+
+barcode_index = StaleWhileRevalidateCache(
+    _load_barcode_index,
+    ttl=PRODUCT_INDEX_TTL,
+    stale_ttl=PRODUCT_INDEX_STALE_TTL
+)
+
+
+def lookup_barcodes(codes):
+    """Resolve scanned barcodes to products.
+
+    Price and stock are what a sale is made at, so they are read live with
+    a single query on the barcode column. Names and categories come from
+    the in-process index; a code the index has for a different product, or
+    doesn't know yet (a product added or re-coded by another worker), falls
+    back to one more query. Returns {barcode: product dict} for the codes
+    found.
+    """
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return {}
+
+    live = db.session.query(Product.barcode, Product.id, Product.price, Product.quantity)\
+        .filter(Product.barcode.in_(codes)).all()
+    if not live:
+        return {}
+
+    index = barcode_index.get()
+    found = {}
+    for barcode, product_id, price, quantity in live:
+        entry = index.get(barcode)
+        if entry is not None and entry['id'] == product_id:
+            found[barcode] = dict(entry, price=float(price), available_quantity=quantity)
+
+    stock = {barcode: quantity for barcode, _, _, quantity in live}
+    unknown = [barcode for barcode in stock if barcode not in found]
+    if unknown:
+        for row in _barcode_rows(unknown):
+            found[row[1]] = dict(_product_entry(*row), available_quantity=stock[row[1]])
+
+    return {code: found[code] for code in codes if code in found}
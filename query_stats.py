@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter, deque
+from functools import lru_cache
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Set SQL_INSTRUMENTATION=0 to turn the per-request query accounting off
+SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '1') != '0'
+
+# A statement shape run this many times in one request is an N+1 suspect
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+
+# Slowest statements kept per request, and requests kept for /_debug/queries
+SLOWEST_STATEMENTS = 5
+RECENT_REQUESTS = 100
+
+# Endpoints not worth recording: static files and the debug page itself
+IGNORED_ENDPOINTS = ('static', 'debug_queries')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETER_LIST = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement):
+    """The statement with literals and IN-list lengths folded away.
+
+    Two statements with the same shape differ only in their values, so a
+    shape repeated many times in one request is a query run per row.
+    SQLAlchemy reuses the same compiled text for each query, so the cache
+    keeps this off the hot path.
+    """
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PARAMETER_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class RequestQueries:
+    """Statements executed while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self.slowest = []  # (ms, shape), at most SLOWEST_STATEMENTS, slowest first
+
+    def add(self, statement, elapsed_ms):
+        shape = statement_shape(statement)
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[shape] += 1
+        if len(self.slowest) < SLOWEST_STATEMENTS or elapsed_ms > self.slowest[-1][0]:
+            self.slowest.append((elapsed_ms, shape))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_STATEMENTS:]
+
+    def suspects(self):
+        """(shape, times run) for every shape at or over N_PLUS_ONE_THRESHOLD, most repeated first"""
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count >= N_PLUS_ONE_THRESHOLD]
+
+    def summary(self, method, path, status):
+        return {
+            'method': method,
+            'path': path,
+            'status': status,
+            'queries': self.count,
+            'db_ms': round(self.total_ms, 2),
+            'slowest': [{'ms': round(ms, 2), 'statement': shape} for ms, shape in self.slowest],
+            'n_plus_one': [{'count': count, 'statement': shape} for shape, count in self.suspects()]
+        }
+
+
+_recent = deque(maxlen=RECENT_REQUESTS)
+_recent_lock = threading.Lock()
+
+
+def recent_requests():
+    """Summaries of the most recent instrumented requests in this process, newest first"""
+    with _recent_lock:
+        return list(reversed(_recent))
+
+
+# Engine events fire for every connection in the process; statements run
+# outside a request (CLI commands, job workers, cache refreshes) are ignored
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if has_request_context():
+        queries = g.get('sql_queries')
+        if queries is not None:
+            queries.add(statement, (time.perf_counter() - started) * 1000)
+
+
+def _discard_timing(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+
+def _start_request():
+    if request.endpoint not in IGNORED_ENDPOINTS:
+        g.sql_queries = RequestQueries()
+
+
+def _finish_request(response):
+    queries = g.pop('sql_queries', None)
+    if queries is None:
+        return response
+
+    # Streamed responses are measured up to the point the body starts
+    summary = queries.summary(request.method, request.path, response.status_code)
+    response.headers['X-Query-Count'] = str(queries.count)
+    response.headers['X-Query-Time-Ms'] = f"{queries.total_ms:.2f}"
+    response.headers['X-Query-N-Plus-One'] = str(len(summary['n_plus_one']))
+    response.headers.add('Server-Timing', f'db;dur={queries.total_ms:.2f};desc="{queries.count} queries"')
+
+    line = json.dumps({'event': 'request_queries', **summary})
+    if summary['n_plus_one']:
+        logger.warning(line)
+    else:
+        logger.info(line)
+
+    with _recent_lock:
+        _recent.append(summary)
+    return response
+
+
+if SQL_INSTRUMENTATION:
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _discard_timing)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
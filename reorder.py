@@ -0,0 +1,148 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, func, insert, select, delete, exists, literal, not_
+from sqlalchemy.orm import Session
+
+from app import app, db
+from models import Product, Category, Supplier, LowStock
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Reorder level for products whose own and category levels are both unset
+DEFAULT_REORDER_LEVEL = 10
+
+# Product columns that can move a product in or out of the low stock set
+TRACKED_ATTRIBUTES = ('quantity', 'reorder_level', 'category_id')
+
+
+def reorder_level():
+    """A product's effective reorder level: its own, else its category's, else the default"""
+    return func.coalesce(Product.reorder_level, Category.reorder_level, DEFAULT_REORDER_LEVEL)
+
+
+def _is_low():
+    return func.coalesce(Product.quantity, 0) < reorder_level()
+
+
+def _products(*columns):
+    return select(*columns).outerjoin(Category, Product.category_id == Category.id)
+
+
+def refresh_low_stock(connection, condition):
+    """Bring the low stock rows of the products matching `condition` up to date.
+
+    Two statements whatever the number of products: drop the ones that are
+    no longer low, then add the newly low ones. Products that stay low keep
+    the time they were first flagged.
+    """
+    connection.execute(delete(LowStock.__table__).where(LowStock.product_id.in_(
+        _products(Product.id).where(condition, not_(_is_low()))
+    )))
+    connection.execute(insert(LowStock.__table__).from_select(
+        ['product_id', 'flagged_at'],
+        _products(Product.id, literal(datetime.utcnow()))
+        .where(condition, _is_low(), ~exists().where(LowStock.product_id == Product.id))
+    ))
+
+
+def refresh_products(product_ids):
+    """Refresh the low stock set after a bulk quantity change made outside the ORM"""
+    if product_ids:
+        refresh_low_stock(db.session.connection(), Product.id.in_(list(product_ids)))
+
+
+# Products and categories changed through the ORM are refreshed after the
+# flush, once new rows have ids and the changes are visible to SQL
+@event.listens_for(Session, 'after_flush')
+def _refresh_flushed_products(session, flush_context):
+    product_ids, category_ids, deleted_ids = set(), set(), set()
+    for instance in session.new:
+        if isinstance(instance, Product):
+            product_ids.add(instance.id)
+    for instance in session.dirty:
+        if isinstance(instance, Product):
+            state = db.inspect(instance)
+            if any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES):
+                product_ids.add(instance.id)
+        elif isinstance(instance, Category):
+            if db.inspect(instance).attrs.reorder_level.history.has_changes():
+                category_ids.add(instance.id)
+    for instance in session.deleted:
+        if isinstance(instance, Product):
+            deleted_ids.add(instance.id)
+
+    connection = session.connection()
+    if deleted_ids:
+        connection.execute(delete(LowStock.__table__).where(LowStock.product_id.in_(deleted_ids)))
+    if product_ids:
+        refresh_low_stock(connection, Product.id.in_(product_ids))
+    if category_ids:
+        refresh_low_stock(connection, Product.category_id.in_(category_ids))
+
+
+def low_stock_count():
+    """Number of products below their reorder level; reads only the low stock set"""
+    return db.session.scalar(select(func.count()).select_from(LowStock))
+
+
+def low_stock_by_supplier(supplier_id=None):
+    """Low stock products grouped by supplier, for drawing up purchase orders.
+
+    Returns a list of {'id', 'name', 'items'} dicts ordered by supplier name,
+    with products that have no supplier last.
+    """
+    query = select(Product, Supplier.id, Supplier.name, reorder_level(), LowStock.flagged_at)\
+        .select_from(LowStock)\
+        .join(Product, Product.id == LowStock.product_id)\
+        .outerjoin(Category, Product.category_id == Category.id)\
+        .outerjoin(Supplier, Product.supplier_id == Supplier.id)\
+        .order_by(Supplier.name.is_(None), Supplier.name, Product.name)
+    if supplier_id is not None:
+        query = query.where(Product.supplier_id == supplier_id)
+
+    groups = []
+    for product, group_id, group_name, level, flagged_at in db.session.execute(query):
+        if not groups or groups[-1]['id'] != group_id:
+            groups.append({'id': group_id, 'name': group_name, 'items': []})
+        quantity = product.quantity or 0
+        groups[-1]['items'].append({
+            'id': product.id,
+            'name': product.name,
+            'barcode': product.barcode,
+            'quantity': quantity,
+            'reorder_level': level,
+            'shortfall': level - quantity,
+            'flagged_at': flagged_at.isoformat()
+        })
+    return groups
+
+
+def fill_low_stock(connection):
+    """Replace the low stock set with the products currently below their reorder level"""
+    connection.execute(delete(LowStock.__table__))
+    connection.execute(insert(LowStock.__table__).from_select(
+        ['product_id', 'flagged_at'],
+        _products(Product.id, literal(datetime.utcnow())).where(_is_low())
+    ))
+
+
+def rebuild_low_stock():
+    """Recompute the low stock set from the product table"""
+    try:
+        fill_low_stock(db.session.connection())
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding low stock set: {str(e)}")
+        raise
+
+    return low_stock_count()
+
+
+@app.cli.command('rebuild-low-stock')
+def rebuild_low_stock_command():
+    """Recompute the low stock set from product quantities and reorder levels."""
+    count = rebuild_low_stock()
+    print(f"Rebuilt low stock set: {count} products below their reorder level.")
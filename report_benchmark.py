@@ -0,0 +1,124 @@
+import time
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import click
+from sqlalchemy import event, func, insert
+
+from app import app, db
+from models import Product, Category, Customer, Invoice, DailySales
+from report_engine import REPORTS, DateRange
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Seeded rows are dated well before any real trading so they can't collide
+# with existing daily sales rows
+SEED_START = date(2000, 1, 1)
+
+
+def _seed(products, customers, invoices, days):
+    """Insert a synthetic dataset in the current transaction"""
+    categories = [{'name': f'Benchmark category {i}'} for i in range(8)]
+    db.session.execute(insert(Category), categories)
+    category_ids = db.session.scalars(
+        db.select(Category.id).where(Category.name.like('Benchmark category %'))).all()
+
+    db.session.execute(insert(Product), [
+        {'name': f'Benchmark product {i}', 'price': Decimal(100 + i % 900), 'quantity': i % 25,
+         'category_id': category_ids[i % len(category_ids)] if i % 50 else None}
+        for i in range(products)
+    ])
+    db.session.execute(insert(Customer), [
+        {'name': f'Benchmark customer {i}'} for i in range(customers)
+    ])
+    customer_ids = db.session.scalars(
+        db.select(Customer.id).where(Customer.name.like('Benchmark customer %'))).all()
+
+    start = datetime.combine(SEED_START, datetime.min.time())
+    db.session.execute(insert(Invoice), [
+        {'invoice_number': f'BENCH-{i}', 'customer_id': customer_ids[i % len(customer_ids)],
+         'issue_date': start + timedelta(days=i % days, minutes=i % 600),
+         'final_amount': Decimal(500 + i % 5000), 'status': ('paid', 'paid', 'pending')[i % 3]}
+        for i in range(invoices)
+    ])
+    db.session.execute(insert(DailySales), [
+        {'sales_date': SEED_START + timedelta(days=i), 'status': 'paid',
+         'revenue': Decimal(10000 + i), 'invoice_count': 10 + i % 7}
+        for i in range(days)
+    ])
+
+
+def _legacy_report(report_type, start_date, end_date):
+    """The previous report code: a row query plus separate scans for totals"""
+    if report_type == 'sales':
+        rows = db.session.query(DailySales.sales_date, DailySales.revenue, DailySales.invoice_count)\
+            .filter(DailySales.status == 'paid', DailySales.sales_date >= start_date,
+                    DailySales.sales_date <= end_date)\
+            .order_by(DailySales.sales_date).all()
+        return rows, sum(row.revenue for row in rows)
+
+    if report_type == 'inventory':
+        rows = db.session.query(Product.name, Product.barcode, Category.name, Product.quantity,
+                                Product.price, Product.price * Product.quantity)\
+            .join(Category).order_by(Product.id).all()
+        return (rows, db.session.query(func.sum(Product.quantity)).scalar(),
+                db.session.query(func.sum(Product.price * Product.quantity)).scalar())
+
+    rows = db.session.query(Customer.name, Customer.email, Customer.phone,
+                            func.count(Invoice.id), func.sum(Invoice.final_amount))\
+        .outerjoin(Invoice)\
+        .filter(Invoice.status == 'paid', Invoice.issue_date >= start_date,
+                Invoice.issue_date <= end_date)\
+        .group_by(Customer.id).order_by(Customer.id).all()
+    return rows
+
+
+def _measure(run, repeat):
+    """Best wall time in milliseconds and statements issued per run"""
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - began) * 1000)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return min(timings), len(statements) // repeat
+
+
+@app.cli.command('benchmark-reports')
+@click.option('--products', default=20000, help='Products to seed')
+@click.option('--customers', default=5000, help='Customers to seed')
+@click.option('--invoices', default=50000, help='Invoices to seed')
+@click.option('--days', default=730, help='Days of daily sales to seed')
+@click.option('--repeat', default=5, help='Runs per report; the best is reported')
+def benchmark_reports_command(products, customers, invoices, days, repeat):
+    """Time the report engine against the previous report queries.
+
+    The dataset is seeded inside a transaction that is rolled back at the
+    end, so the command leaves the database as it found it.
+    """
+    try:
+        _seed(products, customers, invoices, days)
+        db.session.flush()
+        start_date, end_date = SEED_START, SEED_START + timedelta(days=days - 1)
+        date_range = DateRange(start_date, end_date)
+
+        print(f"{'report':<10} {'previous ms':>12} {'queries':>8} {'engine ms':>10} {'queries':>8}")
+        for report_type in ('sales', 'inventory', 'customers'):
+            report = REPORTS[report_type]
+            legacy_ms, legacy_queries = _measure(
+                lambda: _legacy_report(report_type, start_date, end_date), repeat)
+            engine_ms, engine_queries = _measure(lambda: report.run(date_range), repeat)
+            print(f"{report_type:<10} {legacy_ms:>12.1f} {legacy_queries:>8} "
+                  f"{engine_ms:>10.1f} {engine_queries:>8}")
+    finally:
+        db.session.rollback()
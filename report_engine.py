@@ -0,0 +1,420 @@
+import copy
+import logging
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, func, case, false, DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from app import db
+from models import (Product, Category, Customer, Invoice, DailySales, DailyServiceSales, JewelryService,
+                    InventoryValuation, InventoryValuationSnapshot)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class _Rollup(ColumnElement):
+    """GROUP BY columns with super-aggregate rows: ROLLUP(a, b), or MySQL's a, b WITH ROLLUP"""
+
+    inherit_cache = True
+    _traverse_internals = [('clauses', InternalTraversal.dp_clauseelement_tuple)]
+
+    def __init__(self, *clauses):
+        self.clauses = tuple(clauses)
+
+
+@compiles(_Rollup)
+def _compile_rollup(element, compiler, **kw):
+    return 'ROLLUP(%s)' % ', '.join(compiler.process(c, **kw) for c in element.clauses)
+
+
+@compiles(_Rollup, 'mysql')
+def _compile_rollup_mysql(element, compiler, **kw):
+    return '%s WITH ROLLUP' % ', '.join(compiler.process(c, **kw) for c in element.clauses)
+
+
+# Databases that get subtotals from GROUP BY ROLLUP; others (SQLite) total
+# the detail rows of the same query
+ROLLUP_DIALECTS = ('mysql', 'postgresql')
+
+# MySQL allows ORDER BY with WITH ROLLUP, and has GROUPING(), from 8.0.12;
+# older servers and MariaDB take the folded path
+MYSQL_ROLLUP_VERSION = (8, 0, 12)
+
+
+def rollup_supported(dialect):
+    """Whether reports can get their subtotals from GROUP BY ROLLUP on `dialect`"""
+    if dialect.name == 'mysql':
+        return not dialect.is_mariadb and (dialect.server_version_info or ()) >= MYSQL_ROLLUP_VERSION
+    return dialect.name in ROLLUP_DIALECTS
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+class DateRange:
+    """Inclusive range of days shared by every dated report; either end may be open"""
+
+    def __init__(self, start=None, end=None):
+        self.start = _as_date(start)
+        self.end = _as_date(end)
+
+    def conditions(self, column):
+        # Compare a whole day at a time, whether the column holds dates or datetimes
+        as_datetime = isinstance(column.type, DateTime)
+        bounds = []
+        if self.start:
+            start = datetime.combine(self.start, datetime.min.time()) if as_datetime else self.start
+            bounds.append(column >= start)
+        if self.end:
+            end = self.end + timedelta(days=1)
+            bounds.append(column < (datetime.combine(end, datetime.min.time()) if as_datetime else end))
+        return bounds
+
+    @property
+    def label(self):
+        start = self.start.strftime('%Y-%m-%d') if self.start else 'All'
+        end = (self.end or date.today()).strftime('%Y-%m-%d')
+        return f"{start} to {end}"
+
+
+# One output column: `kind` is 'key' (the row's group key), 'attribute'
+# (a per-row detail, taken with MIN) or a measure, which gets subtotals and
+# a grand total: 'sum' or 'count' of `expression`, or 'ratio' of the sums
+# of a (numerator, denominator) pair, e.g. an average from stored totals
+ReportColumn = namedtuple('ReportColumn', 'name header expression kind')
+
+MEASURES = {
+    'sum': (func.sum, lambda expression: expression),
+    'count': (func.count, lambda expression: case((expression.is_(None), 0), else_=1)),
+}
+
+
+def _ratio(numerator, denominator):
+    return numerator * 1.0 / func.nullif(denominator, 0)
+
+
+class ReportResult:
+    """Rows of a report with per-group subtotals and grand totals of its measures"""
+
+    def __init__(self, rows, subtotals, totals):
+        self.rows = rows
+        self.subtotals = subtotals
+        self.totals = totals
+
+
+class Report:
+    """A grouped report computed in a single round trip.
+
+    Rows are grouped by `key`; when `subtotal_by` is given they are also
+    grouped by it (outermost), and every measure gets a subtotal per
+    `subtotal_by` value plus a grand total, all from the same query.
+
+    `per_row` marks reports where each source row (after joins and
+    filters) is already one report row, so detail rows are read without
+    a GROUP BY. Rows come back in group order unless `order_by` is given.
+    """
+
+    as_of = None
+
+    def __init__(self, name, title, source, columns, key=None, subtotal_by=None,
+                 joins=(), filters=(), date_column=None, per_row=False, order_by=None):
+        self.name = name
+        self.title = title
+        self.source = source
+        self.columns = columns
+        self.key = key if key is not None else next(c.expression for c in columns if c.kind == 'key')
+        self.subtotal_by = subtotal_by
+        self.joins = joins
+        self.filters = filters
+        self.date_column = date_column
+        self.per_row = per_row
+        self.order_by = order_by
+
+    @property
+    def headers(self):
+        return [c.header for c in self.columns]
+
+    @property
+    def measures(self):
+        return [c for c in self.columns if c.kind in MEASURES or c.kind == 'ratio']
+
+    @property
+    def dated(self):
+        return self.date_column is not None
+
+    def column_index(self, name):
+        return next(i for i, c in enumerate(self.columns) if c.name == name)
+
+    def for_range(self, date_range):
+        """The report to run for `date_range`; see SnapshotReport"""
+        return self
+
+    def filtered(self, *conditions, as_of=None):
+        """A copy of this report with extra filters"""
+        report = copy.copy(self)
+        report.filters = [*self.filters, *conditions]
+        report.as_of = as_of
+        return report
+
+    def period(self, date_range):
+        if self.as_of is not None:
+            return f"As of {self.as_of.strftime('%Y-%m-%d')}"
+        if self.dated:
+            return date_range.label
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def _groups(self):
+        return ([self.subtotal_by] if self.subtotal_by is not None else []) + [self.key]
+
+    def _output_columns(self, aggregate):
+        selected = []
+        for column in self.columns:
+            if column.kind == 'key':
+                expression = self.key
+            elif column.kind == 'attribute':
+                expression = func.min(column.expression) if aggregate else column.expression
+            elif column.kind == 'ratio':
+                numerator, denominator = column.expression
+                expression = _ratio(func.sum(numerator), func.sum(denominator)) if aggregate \
+                    else _ratio(numerator, denominator)
+            else:
+                grouped, single = MEASURES[column.kind]
+                expression = grouped(column.expression) if aggregate else single(column.expression)
+            selected.append(expression.label(column.name))
+        return selected
+
+    def _select(self, date_range, *extra, aggregate=True):
+        query = select(*self._output_columns(aggregate), *extra).select_from(self.source)
+        for target, onclause, outer in self.joins:
+            query = query.join(target, onclause, isouter=outer)
+        query = query.where(*self.filters)
+        if self.dated and date_range is not None:
+            query = query.where(*date_range.conditions(self.date_column))
+        return query
+
+    def rows_query(self, date_range=None, *extra):
+        """Detail rows only, in report order, for streaming exports"""
+        groups = self._groups()
+        order = self.order_by or groups
+        if self.per_row:
+            return self._select(date_range, *extra, aggregate=False).order_by(*order)
+        return self._select(date_range, *extra).group_by(*groups).order_by(*order)
+
+    def run(self, date_range=None):
+        """Rows, subtotals and grand totals in one query"""
+        if rollup_supported(db.session.connection().dialect):
+            return self._run_rollup(date_range)
+        return self._run_folded(date_range)
+
+    def _empty_totals(self):
+        return {m.name: None if m.kind == 'ratio' else 0 for m in self.measures}
+
+    def rollup_query(self, date_range=None):
+        """The rows, subtotals and totals query, flagged per row with GROUPING()"""
+        groups = self._groups()
+        flags = [func.grouping(g).label(f'_grouping_{i}') for i, g in enumerate(groups)]
+        subtotal_value = [self.subtotal_by.label('_subtotal_by')] if self.subtotal_by is not None else []
+        return (self._select(date_range, *subtotal_value, *flags)
+                .group_by(_Rollup(*groups)).order_by(*(self.order_by or groups)))
+
+    def _run_rollup(self, date_range):
+        query = self.rollup_query(date_range)
+
+        # Super-aggregate rows carry NULL in the rolled-up columns, so they're
+        # told apart from real NULL groups (e.g. uncategorised) by GROUPING()
+        width = len(self.columns)
+        rows, subtotals, totals = [], {}, self._empty_totals()
+        for record in db.session.execute(query):
+            if not record[-1]:
+                rows.append(tuple(record[:width]))
+                continue
+            measures = {m.name: record._mapping[m.name] if m.kind == 'ratio' else record._mapping[m.name] or 0
+                        for m in self.measures}
+            if self.subtotal_by is not None and not record[-2]:
+                subtotals[record._mapping['_subtotal_by']] = measures
+            else:
+                totals = measures
+        return ReportResult(rows, subtotals, totals)
+
+    def _run_folded(self, date_range):
+        # Measures are additive, so subtotals and totals are summed from the
+        # detail rows as they're read instead of asking the database again.
+        # Ratios are summed as their two halves, read as hidden extra columns.
+        width = len(self.columns)
+        positions = [(i, c.name) for i, c in enumerate(self.columns) if c.kind in MEASURES]
+        extra = []
+        ratios = [c for c in self.columns if c.kind == 'ratio']
+        for column in ratios:
+            for part, expression in zip(('num', 'den'), column.expression):
+                positions.append((width + len(extra), f'_{part}_{column.name}'))
+                extra.append((expression if self.per_row else func.sum(expression)).label(f'_{part}_{column.name}'))
+
+        subtotal_index = None
+        if self.subtotal_by is not None:
+            # Reuse an output column holding the subtotal value, if there is one
+            subtotal_index = next((i for i, c in enumerate(self.columns)
+                                   if c.expression is self.subtotal_by), None)
+            if subtotal_index is None:
+                subtotal_index = width + len(extra)
+                extra.append(self.subtotal_by.label('_subtotal_by'))
+
+        def empty():
+            return {name: 0 for _, name in positions}
+
+        rows, subtotals, totals = [], {}, empty()
+        for record in db.session.execute(self.rows_query(date_range, *extra)):
+            rows.append(tuple(record[:width]) if extra else record)
+            group = None
+            if subtotal_index is not None:
+                group = subtotals.get(record[subtotal_index])
+                if group is None:
+                    group = subtotals[record[subtotal_index]] = empty()
+            for index, name in positions:
+                value = record[index]
+                if value:
+                    totals[name] += value
+                    if group is not None:
+                        group[name] += value
+
+        def finish(sums):
+            for column in ratios:
+                numerator = sums.pop(f'_num_{column.name}')
+                denominator = sums.pop(f'_den_{column.name}')
+                sums[column.name] = numerator / denominator if denominator else None
+            return sums
+
+        return ReportResult(rows, {value: finish(sums) for value, sums in subtotals.items()}, finish(totals))
+
+
+class SnapshotReport(Report):
+    """A report over running totals that reads the newest snapshot instead
+    when the range ends before today.
+
+    `snapshots` is the same report over the snapshot table and
+    `snapshot_date` that table's date column.
+    """
+
+    def __init__(self, live, snapshots, snapshot_date):
+        self.__dict__.update(live.__dict__)
+        self.snapshots = snapshots
+        self.snapshot_date = snapshot_date
+
+    def for_range(self, date_range):
+        today = date.today()
+        if date_range.end is None or date_range.end >= today:
+            return self.filtered(as_of=today)
+
+        taken = db.session.scalar(select(func.max(self.snapshot_date))
+                                  .where(self.snapshot_date <= date_range.end))
+        if taken is None:
+            return self.snapshots.filtered(false(), as_of=date_range.end)
+        return self.snapshots.filtered(self.snapshot_date == taken, as_of=taken)
+
+
+# Report definitions
+REPORTS = {}
+
+
+def register_report(report):
+    REPORTS[report.name] = report
+    return report
+
+
+register_report(Report(
+    'sales', 'Sales Report',
+    source=DailySales,
+    columns=[
+        ReportColumn('date', 'Date', DailySales.sales_date, 'key'),
+        ReportColumn('invoice_count', 'Number of Invoices', DailySales.invoice_count, 'sum'),
+        ReportColumn('total_sales', 'Total Sales', DailySales.revenue, 'sum'),
+    ],
+    filters=[DailySales.status == 'paid'],
+    date_column=DailySales.sales_date,
+    per_row=True
+))
+
+register_report(Report(
+    'inventory', 'Inventory Report',
+    source=Product,
+    columns=[
+        ReportColumn('name', 'Product', Product.name, 'attribute'),
+        ReportColumn('barcode', 'Barcode', Product.barcode, 'attribute'),
+        ReportColumn('category', 'Category', Category.name, 'attribute'),
+        ReportColumn('quantity', 'Quantity', Product.quantity, 'sum'),
+        ReportColumn('price', 'Unit Price', Product.price, 'attribute'),
+        ReportColumn('total_value', 'Total Value', Product.price * Product.quantity, 'sum'),
+    ],
+    key=Product.id,
+    subtotal_by=Category.name,
+    joins=[(Category, Product.category_id == Category.id, True)],
+    per_row=True,
+    order_by=[Product.id]
+))
+
+register_report(Report(
+    'customers', 'Customer Report',
+    source=Customer,
+    columns=[
+        ReportColumn('name', 'Customer', Customer.name, 'attribute'),
+        ReportColumn('email', 'Email', Customer.email, 'attribute'),
+        ReportColumn('phone', 'Phone', Customer.phone, 'attribute'),
+        ReportColumn('invoice_count', 'Invoices', Invoice.id, 'count'),
+        ReportColumn('total_spent', 'Total Spent', Invoice.final_amount, 'sum'),
+    ],
+    key=Customer.id,
+    joins=[(Invoice, Invoice.customer_id == Customer.id, False)],
+    filters=[Invoice.status == 'paid'],
+    date_column=Invoice.issue_date
+))
+
+register_report(Report(
+    'services', 'Services Report',
+    source=DailyServiceSales,
+    columns=[
+        ReportColumn('name', 'Service', JewelryService.name, 'attribute'),
+        ReportColumn('service_type', 'Type', JewelryService.service_type, 'attribute'),
+        ReportColumn('service_count', 'Services', DailyServiceSales.service_count, 'sum'),
+        ReportColumn('revenue', 'Revenue', DailyServiceSales.revenue, 'sum'),
+        ReportColumn('deposit_amount', 'Deposits', DailyServiceSales.deposit_amount, 'sum'),
+        ReportColumn('turnaround', 'Avg. Turnaround (days)',
+                     (DailyServiceSales.turnaround_days, DailyServiceSales.turnaround_count), 'ratio'),
+    ],
+    key=JewelryService.id,
+    subtotal_by=JewelryService.service_type,
+    joins=[(JewelryService, DailyServiceSales.service_id == JewelryService.id, False)],
+    # Open repair orders carry deposits, so everything but cancelled work counts
+    filters=[DailyServiceSales.status != 'cancelled'],
+    date_column=DailyServiceSales.sales_date
+))
+
+
+def _valuation_report(model):
+    return Report(
+        'valuation', 'Stock Valuation',
+        source=model,
+        columns=[
+            ReportColumn('category', 'Category', Category.name, 'attribute'),
+            ReportColumn('metal_type', 'Metal', model.metal_type, 'attribute'),
+            ReportColumn('purity', 'Purity', model.purity, 'attribute'),
+            ReportColumn('units', 'Units', model.units, 'sum'),
+            ReportColumn('retail_value', 'Retail Value', model.retail_value, 'sum'),
+            ReportColumn('cost_value', 'Cost Value', model.cost_value, 'sum'),
+            ReportColumn('gross_weight', 'Gross Weight (g)', model.gross_weight, 'sum'),
+        ],
+        key=model.id,
+        subtotal_by=Category.name,
+        joins=[(Category, model.category_id == Category.id, True)],
+        per_row=True
+    )
+
+
+register_report(SnapshotReport(
+    _valuation_report(InventoryValuation),
+    _valuation_report(InventoryValuationSnapshot),
+    InventoryValuationSnapshot.snapshot_date
+))
@@ -0,0 +1,153 @@
+import io
+import re
+import csv
+import zipfile
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from bulk_export import ZipStream
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip, and written per chunk handed to the client
+REPORT_EXPORT_BATCH = 1000
+
+REPORT_EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Text starting with one of these is read as a formula by spreadsheet apps
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+
+def _literal_text(value):
+    """Quote text a spreadsheet would evaluate, such as a customer named '=HYPERLINK(...)'"""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(headers, rows):
+    """Yield a CSV file in chunks of REPORT_EXPORT_BATCH rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_literal_text(value) for value in row])
+        if count % REPORT_EXPORT_BATCH == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_cell(ref, value):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    text = escape(_literal_text(_XML_ILLEGAL.sub('', str(value))))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number, values, columns):
+    cells = ''.join(_xlsx_cell(f'{column}{number}', value) for column, value in zip(columns, values))
+    return f'<row r="{number}">{cells}</row>'.encode('utf-8')
+
+
+def stream_xlsx(headers, rows, sheet_name='Report'):
+    """Yield a single-sheet XLSX workbook in chunks.
+
+    The sheet uses inline strings rather than a shared string table, so
+    each row is written to the archive as soon as it is read and memory
+    use doesn't grow with the row count.
+    """
+    columns = [_column_letter(i) for i in range(len(headers))]
+    sink = ZipStream()
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name[:31])))
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        b'<sheetData>')
+            sheet.write(_xlsx_row(1, headers, columns))
+
+            for number, row in enumerate(rows, 2):
+                sheet.write(_xlsx_row(number, row, columns))
+                if number % REPORT_EXPORT_BATCH == 0:
+                    yield sink.drain()
+
+            sheet.write(b'</sheetData></worksheet>')
+
+    yield sink.drain()
+
+
+def stream_report(fmt, headers, rows, title='Report'):
+    """Stream `rows` as `fmt` ('csv' or 'xlsx')"""
+    if fmt == 'xlsx':
+        return stream_xlsx(headers, rows, sheet_name=title)
+    return stream_csv(headers, rows)
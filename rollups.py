@@ -0,0 +1,175 @@
+import logging
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from app import app, db
+from models import Invoice, InvoiceItem, DailySales, DailyServiceSales
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Invoices read per round trip when rebuilding the service rollup
+REBUILD_BATCH = 500
+
+
+def _bump(model, key, deltas):
+    """Add `deltas` (column name -> amount) to the `model` row matching `key`, creating it if needed"""
+    updates = {getattr(model, name): getattr(model, name) + amount for name, amount in deltas.items()}
+    rollup = model.query.filter_by(**key)
+    
+    # Relative updates so concurrent writers never lose each other's totals
+    if rollup.update(updates, synchronize_session=False):
+        return
+    
+    try:
+        with db.session.begin_nested():
+            db.session.add(model(**key, **deltas))
+    except IntegrityError:
+        # Another worker created the row first
+        rollup.update(updates, synchronize_session=False)
+
+
+def _bump_daily_sales(sales_date, status, revenue, count, tax, discount):
+    """Add the given deltas to one daily_sales row, creating it if needed"""
+    _bump(DailySales, {'sales_date': sales_date, 'status': status}, {
+        'revenue': revenue,
+        'invoice_count': count,
+        'tax_amount': tax,
+        'discount': discount,
+    })
+
+
+def _service_lines(invoice):
+    """Per-service deltas for an invoice's service lines.
+    
+    The invoice deposit is shared between its service lines in proportion
+    to their totals, since deposits are taken against the work ordered.
+    """
+    lines = [item for item in invoice.items if item.is_service and item.service_id]
+    service_total = sum(Decimal(item.total_price or 0) for item in lines)
+    deposit = Decimal(invoice.deposit_amount or 0)
+    
+    turnaround = None
+    if invoice.estimated_ready_date and invoice.issue_date:
+        turnaround = max((invoice.estimated_ready_date.date() - invoice.issue_date.date()).days, 0)
+    
+    services = {}
+    for item in lines:
+        total = Decimal(item.total_price or 0)
+        deltas = services.setdefault(item.service_id, {
+            'revenue': Decimal(0),
+            'service_count': 0,
+            'deposit_amount': Decimal(0),
+            'turnaround_days': 0,
+            'turnaround_count': 0,
+        })
+        deltas['revenue'] += total
+        deltas['service_count'] += item.quantity or 0
+        if service_total:
+            deltas['deposit_amount'] += (deposit * total / service_total).quantize(Decimal('0.01'))
+        if turnaround is not None:
+            deltas['turnaround_days'] += turnaround
+            deltas['turnaround_count'] += 1
+    return services
+
+
+def record_invoice(invoice, status=None, sign=1):
+    """Add (sign=1) or remove (sign=-1) an invoice from the daily rollups.
+
+    Must be called inside the transaction that writes the invoice.
+    """
+    sales_date = invoice.issue_date.date()
+    status = status or invoice.status
+    _bump_daily_sales(
+        sales_date,
+        status,
+        sign * Decimal(invoice.final_amount or 0),
+        sign,
+        sign * Decimal(invoice.tax_amount or 0),
+        sign * Decimal(invoice.discount or 0)
+    )
+    
+    for service_id, deltas in _service_lines(invoice).items():
+        _bump(DailyServiceSales, {'sales_date': sales_date, 'status': status, 'service_id': service_id},
+              {name: sign * amount for name, amount in deltas.items()})
+
+
+def record_status_change(invoice, old_status):
+    """Move an invoice's totals from its old status bucket to its current one"""
+    if old_status == invoice.status:
+        return
+    record_invoice(invoice, status=old_status, sign=-1)
+    record_invoice(invoice)
+
+
+def rebuild_daily_sales():
+    """Recompute the whole daily_sales table from the invoice table"""
+    day = func.date(Invoice.issue_date)
+    source = db.session.query(
+        day,
+        Invoice.status,
+        func.coalesce(func.sum(Invoice.final_amount), 0),
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.tax_amount), 0),
+        func.coalesce(func.sum(Invoice.discount), 0)
+    ).filter(Invoice.issue_date.isnot(None)).group_by(day, Invoice.status)
+    
+    try:
+        DailySales.query.delete(synchronize_session=False)
+        db.session.execute(insert(DailySales).from_select(
+            ['sales_date', 'status', 'revenue', 'invoice_count', 'tax_amount', 'discount'],
+            source
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding daily sales: {str(e)}")
+        raise
+    
+    return DailySales.query.count()
+
+
+def rebuild_daily_service_sales():
+    """Recompute the whole daily_service_sales table from invoice service lines"""
+    invoices = db.session.scalars(
+        select(Invoice).options(selectinload(Invoice.items))
+        .where(Invoice.issue_date.isnot(None),
+               Invoice.items.any(db.and_(InvoiceItem.is_service.is_(True), InvoiceItem.service_id.isnot(None))))
+        .execution_options(yield_per=REBUILD_BATCH)
+    )
+    
+    # Deposits are split across lines in Python, so the totals are folded here
+    rows = {}
+    for invoice in invoices:
+        sales_date = invoice.issue_date.date()
+        for service_id, deltas in _service_lines(invoice).items():
+            row = rows.setdefault((sales_date, invoice.status, service_id), dict.fromkeys(deltas, 0))
+            for name, amount in deltas.items():
+                row[name] += amount
+    
+    try:
+        DailyServiceSales.query.delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(DailyServiceSales), [
+                {'sales_date': sales_date, 'status': status, 'service_id': service_id, **totals}
+                for (sales_date, status, service_id), totals in rows.items()
+            ])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding daily service sales: {str(e)}")
+        raise
+    
+    return len(rows)
+
+
+@app.cli.command('rebuild-daily-sales')
+def rebuild_daily_sales_command():
+    """Backfill the daily_sales and daily_service_sales rollups from existing invoices."""
+    rows = rebuild_daily_sales()
+    print(f"Rebuilt daily sales rollup: {rows} rows.")
+    rows = rebuild_daily_service_sales()
+    print(f"Rebuilt daily service sales rollup: {rows} rows.")
@@ -1,23 +1,58 @@
 import os
+import io
 import logging
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
 
-from flask import render_template, url_for, flash, redirect, request, jsonify, abort, make_response
+from flask import render_template, url_for, flash, redirect, request, jsonify, abort, make_response, send_file, Response, stream_with_context
 from flask_login import login_user, current_user, logout_user, login_required
 from werkzeug.security import generate_password_hash
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case
+from sqlalchemy.orm import joinedload
 
 from app import app, db
-from models import User, Category, Supplier, Product, Customer, Invoice, InvoiceItem, JewelryService
+from models import User, Category, Supplier, Product, Customer, Invoice, InvoiceItem, JewelryService, DailySales
 from forms import (RegistrationForm, LoginForm, CategoryForm, SupplierForm, ProductForm, 
                   CustomerForm, InvoiceForm, InvoiceItemForm, JewelryServiceForm, ReportForm)
-from utils import generate_invoice_number, generate_invoice_pdf
+from utils import generate_invoice_pdf
+from sequences import generate_invoice_number
+from pagination import keyset_paginate, clamp_per_page
+from rollups import record_invoice, record_status_change
+from cache import StaleWhileRevalidateCache
+from stock import InsufficientStockError, InvalidInvoiceLineError, sold_quantities, decrement_stock
+from ledger import move_stock, stock_as_of, end_of_day, StockMovementError
+from reorder import low_stock_count, low_stock_by_supplier
+from barcode_allocator import allocate_barcode
+from barcode_generator import render_barcode, BARCODE_MIMETYPES
+from product_index import barcode_index, lookup_barcodes, MAX_BATCH_BARCODES
+from search import search_products, product_filter, search_customers, customer_filter
+from labels import label_products, render_label_sheet, MAX_LABELS
+from pdf_cache import get_invoice_pdf, discard_frozen_pdf
+from bulk_export import export_invoice_ids, stream_invoice_zip
+from report_export import stream_report, REPORT_EXPORT_BATCH, REPORT_EXPORT_MIMETYPES
+from report_engine import REPORTS, DateRange
+from valuation import metal_holdings
+from jobs import job_handler, submit_job, job_to_dict
+from query_stats import recent_requests, N_PLUS_ONE_THRESHOLD
+from models import Job, StockMovement, LowStock
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# The invoice builder prefetches items sold in this many recent days
+RECENT_ITEMS_DAYS = 30
+RECENT_PRODUCTS = 20
+RECENT_SERVICES = 10
+
+# Most ids accepted by the batch detail endpoints
+MAX_BATCH_IDS = 100
+
+# Dashboard aggregates are served from cache for this many seconds, then
+# served stale while refreshing in the background for the second window
+DASHBOARD_CACHE_TTL = 60
+DASHBOARD_CACHE_STALE_TTL = 300
+
 # Home route
 @app.route('/')
 def home():
@@ -75,9 +110,8 @@ def logout():
     return redirect(url_for('login'))
 
 # Dashboard
-@app.route('/dashboard')
-@login_required
-def dashboard():
+def _compute_dashboard_stats():
+    """Compute every dashboard aggregate as plain, cacheable data"""
     # Get recent sales data (last 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     
@@ -88,22 +122,30 @@ def dashboard():
     # Total products
     total_products = Product.query.count()
     
-    # Low stock products (less than 10 items)
-    low_stock_count = Product.query.filter(Product.quantity < 10).count()
+    # Low stock products, counted from the maintained low stock set
+    low_stock = low_stock_count()
     
     # Recent invoices
-    recent_invoices = Invoice.query.order_by(desc(Invoice.created_at)).limit(5).all()
+    recent_invoices = [{
+        'id': invoice.id,
+        'invoice_number': invoice.invoice_number,
+        'customer_name': invoice.customer.name,
+        'issue_date': invoice.issue_date,
+        'final_amount': invoice.final_amount,
+        'status': invoice.status
+    } for invoice in Invoice.query.options(joinedload(Invoice.customer))
+        .order_by(desc(Invoice.created_at)).limit(5).all()]
     
-    # Sales data for the chart (last 7 days)
+    # Sales data for the chart (last 7 days), read from the daily rollup
+    first_day = datetime.utcnow().date() - timedelta(days=6)
+    daily_sales = dict(db.session.query(DailySales.sales_date, DailySales.revenue)
+        .filter(DailySales.status == 'paid', DailySales.sales_date >= first_day).all())
     sales_data = []
-    for i in range(7, 0, -1):
-        date = datetime.utcnow() - timedelta(days=i-1)
-        daily_sales = db.session.query(func.sum(Invoice.final_amount))\
-            .filter(Invoice.status == 'paid',
-                    func.date(Invoice.issue_date) == func.date(date)).scalar() or 0
+    for i in range(7):
+        date = first_day + timedelta(days=i)
         sales_data.append({
             'date': date.strftime('%Y-%m-%d'),
-            'amount': float(daily_sales)
+            'amount': float(daily_sales.get(date, 0))
         })
     
     # Top selling products
@@ -115,28 +157,128 @@ def dashboard():
         Invoice.issue_date >= thirty_days_ago
     ).group_by(Product.id).order_by(desc('total_quantity')).limit(5).all()
     
+    return {
+        'total_sales': total_sales,
+        'total_products': total_products,
+        'low_stock_count': low_stock,
+        'recent_invoices': recent_invoices,
+        'sales_data': json.dumps(sales_data),
+        'top_products': [[name, int(quantity)] for name, quantity in top_products]
+    }
+
+dashboard_cache = StaleWhileRevalidateCache(
+    _compute_dashboard_stats,
+    ttl=DASHBOARD_CACHE_TTL,
+    stale_ttl=DASHBOARD_CACHE_STALE_TTL
+)
+
+@app.route('/dashboard')
+@login_required
+def dashboard():
     return render_template('dashboard.html', 
                           title='Dashboard',
-                          total_sales=total_sales,
-                          total_products=total_products,
-                          low_stock_count=low_stock_count,
-                          recent_invoices=recent_invoices,
-                          sales_data=json.dumps(sales_data),
-                          top_products=top_products)
+                          **dashboard_cache.get())
 
 # Inventory Routes
+def _inventory_filters():
+    """Read the inventory filter parameters from the query string"""
+    return {
+        'q': request.args.get('q', '').strip(),
+        'category': request.args.get('category', type=int),
+        'stock': request.args.get('stock', ''),
+    }
+
+def _inventory_query(filters):
+    """Build the filtered product query with the category joined in"""
+    query = Product.query.options(joinedload(Product.category))
+    
+    if filters['category']:
+        query = query.filter(Product.category_id == filters['category'])
+    
+    condition = product_filter(filters['q'])
+    if condition is not None:
+        query = query.filter(condition)
+    
+    if filters['stock'] == 'out':
+        query = query.filter(Product.quantity <= 0)
+    elif filters['stock'] == 'low':
+        query = query.filter(Product.quantity > 0, Product.id.in_(db.select(LowStock.product_id)))
+    elif filters['stock'] == 'in':
+        query = query.filter(Product.quantity > 0, Product.id.not_in(db.select(LowStock.product_id)))
+    
+    return query
+
+def _inventory_page(filters):
+    return keyset_paginate(
+        _inventory_query(filters),
+        Product.id,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        per_page=clamp_per_page(request.args.get('per_page', type=int))
+    )
+
+def _product_to_dict(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'barcode': product.barcode,
+        'category_id': product.category_id,
+        'category': product.category.name if product.category else None,
+        'price': float(product.price),
+        'quantity': product.quantity
+    }
+
 @app.route('/inventory')
 @login_required
 def inventory():
-    products = Product.query.all()
+    filters = _inventory_filters()
+    page = _inventory_page(filters)
     categories = Category.query.all()
     suppliers = Supplier.query.all()
+    low_stock_ids = set(db.session.scalars(db.select(LowStock.product_id)
+                                           .where(LowStock.product_id.in_([p.id for p in page.items]))))
     return render_template('inventory.html', 
                           title='Inventory Management',
-                          products=products,
+                          products=page.items,
+                          low_stock_ids=low_stock_ids,
+                          page=page,
+                          filters={k: v for k, v in filters.items() if v},
                           categories=categories,
                           suppliers=suppliers)
 
+@app.route('/api/inventory', methods=['GET'])
+@login_required
+def inventory_api():
+    page = _inventory_page(_inventory_filters())
+    return jsonify({
+        'products': [_product_to_dict(p) for p in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
+@app.route('/api/products/search', methods=['GET'])
+@login_required
+def search_products_api():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', type=int, default=1), 1)
+    per_page = clamp_per_page(request.args.get('per_page', type=int), default=20)
+    
+    found = search_products(query,
+                            category_id=request.args.get('category', type=int),
+                            supplier_id=request.args.get('supplier', type=int),
+                            page=page,
+                            per_page=per_page)
+    
+    return jsonify({
+        'status': 'success',
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': found['total'],
+        'products': [dict(_product_to_dict(product), score=round(score, 4)) for product, score in found['results']],
+        'facets': found['facets']
+    })
+
 # Category Routes
 @app.route('/category/new', methods=['GET', 'POST'])
 @login_required
@@ -147,7 +289,8 @@ def new_category():
     if form.validate_on_submit():
         category = Category(
             name=form.name.data,
-            description=form.description.data
+            description=form.description.data,
+            reorder_level=form.reorder_level.data
         )
         db.session.add(category)
         db.session.commit()
@@ -169,13 +312,16 @@ def edit_category(category_id):
     if form.validate_on_submit():
         category.name = form.name.data
         category.description = form.description.data
+        category.reorder_level = form.reorder_level.data
         db.session.commit()
+        dashboard_cache.invalidate()
         flash('Category has been updated!', 'success')
         return redirect(url_for('inventory'))
     
     if request.method == 'GET':
         form.name.data = category.name
         form.description.data = category.description
+        form.reorder_level.data = category.reorder_level
     
     return render_template('inventory.html', 
                           title='Edit Category',
@@ -275,32 +421,17 @@ def new_product():
     form.category_id.choices = [(c.id, c.name) for c in Category.query.all()]
     form.supplier_id.choices = [(s.id, s.name) for s in Supplier.query.all()]
     
-    # Generate a new unique 5-digit barcode
-    if request.method == 'GET':
-        # Find the highest existing barcode and increment by 1
-        last_product = Product.query.order_by(Product.id.desc()).first()
-        if last_product and last_product.barcode and last_product.barcode.isdigit():
-            # If the last barcode exists and is a number, increment it
-            new_barcode = str(int(last_product.barcode) + 1).zfill(5)
-        else:
-            # Start with 10000 if no products exist or last product has no valid barcode
-            new_barcode = '10000'
-        
-        # Ensure the barcode is unique
-        while Product.query.filter_by(barcode=new_barcode).first():
-            # If the barcode already exists, increment by 1
-            new_barcode = str(int(new_barcode) + 1).zfill(5)
-        
-        form.barcode.data = new_barcode
-    
     if form.validate_on_submit():
+        # The barcode is only reserved once the product is saved, so opening
+        # and abandoning the form doesn't use up the 5-digit range
         product = Product(
             name=form.name.data,
             description=form.description.data,
-            barcode=form.barcode.data,
+            barcode=form.barcode.data or allocate_barcode(),
             price=form.price.data,
             cost_price=form.cost_price.data,
             quantity=form.quantity.data,
+            reorder_level=form.reorder_level.data,
             
             # Jewelry-specific attributes
             material=form.material.data,
@@ -317,6 +448,8 @@ def new_product():
         )
         db.session.add(product)
         db.session.commit()
+        dashboard_cache.invalidate()
+        barcode_index.invalidate()
         flash('Product has been created!', 'success')
         return redirect(url_for('inventory'))
     
@@ -343,6 +476,7 @@ def edit_product(product_id):
         product.price = form.price.data
         product.cost_price = form.cost_price.data
         product.quantity = form.quantity.data
+        product.reorder_level = form.reorder_level.data
         
         # Jewelry-specific attributes
         product.material = form.material.data
@@ -358,6 +492,8 @@ def edit_product(product_id):
         product.supplier_id = form.supplier_id.data
         product.updated_at = datetime.utcnow()
         db.session.commit()
+        dashboard_cache.invalidate()
+        barcode_index.invalidate()
         flash('Product has been updated!', 'success')
         return redirect(url_for('inventory'))
     
@@ -368,6 +504,7 @@ def edit_product(product_id):
         form.price.data = product.price
         form.cost_price.data = product.cost_price
         form.quantity.data = product.quantity
+        form.reorder_level.data = product.reorder_level
         
         # Jewelry-specific attributes
         form.material.data = product.material
@@ -399,20 +536,123 @@ def delete_product(product_id):
     
     db.session.delete(product)
     db.session.commit()
+    dashboard_cache.invalidate()
+    barcode_index.invalidate()
     flash('Product has been deleted!', 'success')
     return redirect(url_for('inventory'))
 
+@app.route('/barcode/<code>.<any(png, svg):fmt>')
+@login_required
+def barcode_image(code, fmt):
+    try:
+        data, etag = render_barcode(code, fmt)
+    except ValueError:
+        abort(404)
+    
+    # A code always renders the same image, so browsers may keep it for a year
+    response = Response(data, mimetype=BARCODE_MIMETYPES[fmt])
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    
+    return response.make_conditional(request)
+
+def _label_selection(args):
+    """Read a label sheet product selection from request args or job params"""
+    since = args.get('since') or None
+    return {
+        'category_id': int(args['category']) if args.get('category') else None,
+        'supplier_id': int(args['supplier']) if args.get('supplier') else None,
+        'min_id': int(args['min_id']) if args.get('min_id') else None,
+        'max_id': int(args['max_id']) if args.get('max_id') else None,
+        'received_since': _parse_date(since) if since else None
+    }
+
+def _label_count(products, per_piece):
+    return sum(max(p.quantity or 0, 0) for p in products) if per_piece else len(products)
+
+@job_handler('label_sheet')
+def _label_sheet_job(params):
+    products = label_products(**_label_selection(params))
+    per_piece = bool(params.get('per_piece'))
+    if _label_count(products, per_piece) > MAX_LABELS:
+        raise ValueError(f"Selection needs more than {MAX_LABELS} labels")
+    return 'labels.pdf', 'application/pdf', render_label_sheet(products, per_piece)
+
+@app.route('/labels')
+@login_required
+def label_sheet():
+    try:
+        selection = _label_selection(request.args)
+    except ValueError:
+        abort(400)
+    per_piece = request.args.get('per_piece', type=int, default=0) == 1
+    
+    # Render in the background and return a job id straight away
+    if request.args.get('async'):
+        params = request.args.to_dict()
+        params.pop('async')
+        return _job_accepted(submit_job('label_sheet', params, current_user.id))
+    
+    products = label_products(**selection)
+    count = _label_count(products, per_piece)
+    if not count:
+        flash('No products match the label selection.', 'info')
+        return redirect(url_for('inventory'))
+    if count > MAX_LABELS:
+        flash(f'That selection needs {count} labels; print at most {MAX_LABELS} at a time.', 'warning')
+        return redirect(url_for('inventory'))
+    
+    return send_file(io.BytesIO(render_label_sheet(products, per_piece)),
+                     mimetype='application/pdf',
+                     as_attachment=True,
+                     download_name='labels.pdf')
+
 # Customer Routes
 @app.route('/customers')
 @login_required
 def customers():
     form = CustomerForm()
-    all_customers = Customer.query.all()
+    q = request.args.get('q', '').strip()
+    
+    query = Customer.query
+    condition = customer_filter(q)
+    if condition is not None:
+        query = query.filter(condition)
+    
+    page = keyset_paginate(
+        query,
+        Customer.id,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        per_page=clamp_per_page(request.args.get('per_page', type=int))
+    )
     return render_template('customers.html', 
                           title='Customer Management',
-                          customers=all_customers,
+                          customers=page.items,
+                          page=page,
+                          q=q,
                           form=form)
 
+def _customer_to_dict(customer):
+    return {
+        'id': customer.id,
+        'name': customer.name,
+        'phone': customer.phone,
+        'email': customer.email
+    }
+
+@app.route('/api/customers/search', methods=['GET'])
+@login_required
+def search_customers_api():
+    limit = min(max(request.args.get('limit', type=int, default=10), 1), 50)
+    found = search_customers(request.args.get('q', ''), limit=limit)
+    return jsonify({
+        'status': 'success',
+        'customers': [_customer_to_dict(c) for c in found]
+    })
+
 @app.route('/customer/new', methods=['GET', 'POST'])
 @login_required
 def new_customer():
@@ -501,65 +741,340 @@ def delete_customer(customer_id):
     return redirect(url_for('customers'))
 
 # Sales/Invoices Routes
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def _ledger_filters():
+    """Read the ledger filter parameters from the query string"""
+    return {
+        'start': request.args.get('start', '').strip(),
+        'end': request.args.get('end', '').strip(),
+        'status': request.args.get('status', '').strip(),
+    }
+
+def _apply_ledger_filters(query, filters):
+    """Apply the date range and status filters to an invoice query"""
+    try:
+        if filters['start']:
+            query = query.filter(Invoice.issue_date >= _parse_date(filters['start']))
+        if filters['end']:
+            # End date is inclusive
+            query = query.filter(Invoice.issue_date < _parse_date(filters['end']) + timedelta(days=1))
+    except ValueError:
+        abort(400)
+    
+    if filters['status']:
+        query = query.filter(Invoice.status == filters['status'])
+    
+    return query
+
+def _ledger_page(filters):
+    query = _apply_ledger_filters(Invoice.query.options(joinedload(Invoice.customer)), filters)
+    return keyset_paginate(
+        query,
+        Invoice.id,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        per_page=clamp_per_page(request.args.get('per_page', type=int)),
+        descending=True
+    )
+
+def _ledger_summary(filters):
+    """Totals over the whole filtered ledger, computed in a single query"""
+    query = db.session.query(
+        func.count(Invoice.id).label('invoice_count'),
+        func.sum(case((Invoice.status == 'paid', Invoice.final_amount), else_=0)).label('total_sales'),
+        func.sum(case((Invoice.status == 'paid', 1), else_=0)).label('paid_count'),
+        func.sum(case((Invoice.status == 'pending', 1), else_=0)).label('pending_count')
+    )
+    row = _apply_ledger_filters(query, filters).one()
+    return {
+        'invoice_count': row.invoice_count or 0,
+        'total_sales': float(row.total_sales or 0),
+        'paid_count': int(row.paid_count or 0),
+        'pending_count': int(row.pending_count or 0)
+    }
+
+def _invoice_to_dict(invoice):
+    return {
+        'id': invoice.id,
+        'invoice_number': invoice.invoice_number,
+        'customer': invoice.customer.name,
+        'issue_date': invoice.issue_date.strftime('%Y-%m-%d'),
+        'due_date': invoice.due_date.strftime('%Y-%m-%d') if invoice.due_date else None,
+        'final_amount': float(invoice.final_amount),
+        'status': invoice.status
+    }
+
 @app.route('/sales')
 @login_required
 def sales():
-    invoices = Invoice.query.order_by(desc(Invoice.created_at)).all()
+    filters = _ledger_filters()
+    page = _ledger_page(filters)
     return render_template('sales.html', 
                           title='Sales Management',
-                          invoices=invoices)
+                          invoices=page.items,
+                          page=page,
+                          summary=_ledger_summary(filters),
+                          filters={k: v for k, v in filters.items() if v})
 
 @app.route('/invoices')
 @login_required
 def invoices():
     form = InvoiceForm()  # Add form instance for CSRF token
-    all_invoices = Invoice.query.order_by(desc(Invoice.created_at)).all()
+    filters = _ledger_filters()
+    page = _ledger_page(filters)
     return render_template('invoices.html', 
                           title='Invoice Management',
-                          invoices=all_invoices,
+                          invoices=page.items,
+                          page=page,
+                          filters={k: v for k, v in filters.items() if v},
                           form=form)
 
+@app.route('/api/ledger', methods=['GET'])
+@login_required
+def ledger_api():
+    filters = _ledger_filters()
+    page = _ledger_page(filters)
+    return jsonify({
+        'invoices': [_invoice_to_dict(i) for i in page.items],
+        'summary': _ledger_summary(filters),
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
 @app.route('/invoice/new', methods=['GET', 'POST'])
 @login_required
 def new_invoice():
     form = InvoiceForm()
     
-    # Get customers for dropdown
-    form.customer_id.choices = [(c.id, c.name) for c in Customer.query.all()]
+    # Customers are picked through the typeahead; only a preselected one is rendered
+    form.customer_id.choices = []
+    customer = db.session.get(Customer, request.args.get('customer_id', type=int) or 0)
+    if customer:
+        form.customer_id.choices = [(customer.id, customer.name)]
+        form.customer_id.data = customer.id
     
     # Today's date for default values
     if request.method == 'GET':
         form.issue_date.data = datetime.now()
         form.due_date.data = datetime.now() + timedelta(days=30)
     
+    # Only recently sold items are rendered; the rest are found by search
     return render_template('create_invoice.html', 
                           title='Create Invoice',
                           form=form,
-                          products=Product.query.all(),
-                          services=JewelryService.query.all())
+                          products=_recently_sold(Product, InvoiceItem.product_id, RECENT_PRODUCTS,
+                                                  InvoiceItem.is_service.isnot(True)),
+                          services=_recently_sold(JewelryService, InvoiceItem.service_id, RECENT_SERVICES))
+
+def _recently_sold(model, column, limit, *filters):
+    """The `limit` items most often on invoices of the last RECENT_ITEMS_DAYS"""
+    since = datetime.utcnow() - timedelta(days=RECENT_ITEMS_DAYS)
+    ranked = db.session.query(column.label('id'), func.count(InvoiceItem.id).label('uses'))\
+        .join(Invoice, InvoiceItem.invoice_id == Invoice.id)\
+        .filter(Invoice.created_at >= since, column.isnot(None), *filters)\
+        .group_by(column)\
+        .order_by(desc('uses'))\
+        .limit(limit)\
+        .subquery()
+    return model.query.join(ranked, model.id == ranked.c.id).order_by(ranked.c.uses.desc()).all()
+
+def _batch_ids():
+    """Parse the comma separated `ids` query parameter, or abort with 400"""
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        abort(400)
+    if len(ids) > MAX_BATCH_IDS:
+        abort(400)
+    return ids
+
+def _product_details(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'barcode': product.barcode,
+        'price': float(product.price),
+        'available_quantity': product.quantity
+    }
 
 @app.route('/api/product/<int:product_id>', methods=['GET'])
 @login_required
 def get_product_details(product_id):
     product = Product.query.get_or_404(product_id)
+    return jsonify(_product_details(product))
+
+@app.route('/api/products/batch', methods=['GET'])
+@login_required
+def get_products_batch():
+    ids = _batch_ids()
+    products = Product.query.filter(Product.id.in_(ids)).all() if ids else []
     return jsonify({
-        'id': product.id,
-        'name': product.name,
-        'price': float(product.price),
-        'available_quantity': product.quantity
+        'status': 'success',
+        'products': [_product_details(p) for p in products]
     })
-    
-@app.route('/api/service/<int:service_id>', methods=['GET'])
+
+# Kinds staff can record by hand; sales are written by the invoice flow
+MANUAL_MOVEMENT_KINDS = ('receipt', 'return', 'adjustment', 'transfer')
+
+def _movement_to_dict(movement):
+    return {
+        'id': movement.id,
+        'product_id': movement.product_id,
+        'kind': movement.kind,
+        'quantity': movement.quantity,
+        'invoice_id': movement.invoice_id,
+        'note': movement.note,
+        'created_by': movement.created_by,
+        'created_at': movement.created_at.isoformat()
+    }
+
+@app.route('/api/products/<int:product_id>/movements', methods=['GET'])
 @login_required
-def get_service_details(service_id):
-    service = JewelryService.query.get_or_404(service_id)
+def product_movements(product_id):
+    page = keyset_paginate(
+        StockMovement.query.filter_by(product_id=product_id),
+        StockMovement.id,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        per_page=clamp_per_page(request.args.get('per_page', type=int)),
+        descending=True
+    )
     return jsonify({
+        'movements': [_movement_to_dict(m) for m in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
+@app.route('/api/products/<int:product_id>/movements', methods=['POST'])
+@login_required
+def record_product_movement(product_id):
+    product = Product.query.get_or_404(product_id)
+    data = request.get_json()
+    if not data:
+        return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+    if data.get('kind') not in MANUAL_MOVEMENT_KINDS:
+        return jsonify({'status': 'error', 'message': f'Kind must be one of {", ".join(MANUAL_MOVEMENT_KINDS)}'}), 400
+    quantity = data.get('quantity')
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or not quantity:
+        return jsonify({'status': 'error', 'message': 'Quantity must be a non-zero whole number'}), 400
+
+    try:
+        move_stock(product, data['kind'], quantity, note=(data.get('note') or None))
+        db.session.commit()
+    except StockMovementError as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording stock movement: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    dashboard_cache.invalidate()
+    return jsonify({
+        'status': 'success',
+        'message': 'Stock movement recorded',
+        'quantity': product.quantity
+    })
+
+@app.route('/api/stock/as-of', methods=['GET'])
+@login_required
+def stock_as_of_api():
+    """Stock per product at the end of `date`, optionally limited to `ids`"""
+    try:
+        day = _parse_date(request.args.get('date', '')).date()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Expected a date as YYYY-MM-DD'}), 400
+    ids = _batch_ids() if request.args.get('ids') else None
+
+    checkpoint_at, stock = stock_as_of(end_of_day(day), ids)
+    if checkpoint_at is None:
+        return jsonify({'status': 'error', 'message': f'No stock history recorded on or before {day.isoformat()}'}), 404
+    return jsonify({
+        'status': 'success',
+        'date': day.isoformat(),
+        'checkpoint_at': checkpoint_at.isoformat(),
+        'stock': {str(product_id): quantity for product_id, quantity in stock.items()}
+    })
+
+@app.route('/api/stock/low', methods=['GET'])
+@login_required
+def low_stock_api():
+    """Products below their reorder level, grouped by supplier"""
+    suppliers = low_stock_by_supplier(request.args.get('supplier_id', type=int))
+    return jsonify({
+        'status': 'success',
+        'count': sum(len(supplier['items']) for supplier in suppliers),
+        'suppliers': suppliers
+    })
+
+@app.route('/api/product/by-barcode/<code>', methods=['GET'])
+@login_required
+def get_product_by_barcode(code):
+    product = lookup_barcodes([code]).get(code)
+    if product is None:
+        return jsonify({'status': 'error', 'message': f'No product with barcode {code}'}), 404
+    return jsonify(product)
+
+@app.route('/api/product/by-barcode', methods=['POST'])
+@login_required
+def get_products_by_barcode():
+    data = request.get_json()
+    codes = data.get('codes') if data else None
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        return jsonify({'status': 'error', 'message': 'Expected a list of barcodes in "codes"'}), 400
+    if len(codes) > MAX_BATCH_BARCODES:
+        return jsonify({'status': 'error', 'message': f'At most {MAX_BATCH_BARCODES} barcodes per request'}), 400
+    
+    products = lookup_barcodes(codes)
+    return jsonify({
+        'status': 'success',
+        'products': products,
+        'missing': [code for code in dict.fromkeys(codes) if code not in products]
+    })
+    
+def _service_details(service):
+    return {
         'id': service.id,
         'name': service.name,
         'price': float(service.price),
         'service_type': service.service_type,
         'duration': service.duration,
         'requires_deposit': service.requires_deposit
+    }
+
+@app.route('/api/service/<int:service_id>', methods=['GET'])
+@login_required
+def get_service_details(service_id):
+    service = JewelryService.query.get_or_404(service_id)
+    return jsonify(_service_details(service))
+
+@app.route('/api/services/batch', methods=['GET'])
+@login_required
+def get_services_batch():
+    ids = _batch_ids()
+    services = JewelryService.query.filter(JewelryService.id.in_(ids)).all() if ids else []
+    return jsonify({
+        'status': 'success',
+        'services': [_service_details(s) for s in services]
+    })
+
+@app.route('/api/services/search', methods=['GET'])
+@login_required
+def search_services_api():
+    q = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', type=int, default=10), 1), 50)
+    services = []
+    if q:
+        # The service list is short, so a name match is cheap enough
+        services = JewelryService.query.filter(JewelryService.name.ilike(f'%{q}%'))\
+            .order_by(JewelryService.name)\
+            .limit(limit)\
+            .all()
+    return jsonify({
+        'status': 'success',
+        'services': [_service_details(s) for s in services]
     })
     
 @app.route('/api/customer/create', methods=['POST'])
@@ -635,6 +1150,9 @@ def save_invoice():
         db.session.add(invoice)
         db.session.flush()
         
+        # Take the sold pieces out of stock; fails the whole invoice if any line is short
+        decrement_stock(sold_quantities(data['items']), invoice_id=invoice.id)
+        
         # Add invoice items
         for item in data['items']:
             is_service = item.get('is_service', False)
@@ -650,14 +1168,10 @@ def save_invoice():
                 service_id=service_id
             )
             db.session.add(invoice_item)
-            
-            # Only update product quantity if it's a product (not a service)
-            if not is_service:
-                product = Product.query.get(item['product_id'])
-                if product:
-                    product.quantity -= item['quantity']
         
+        record_invoice(invoice)
         db.session.commit()
+        dashboard_cache.invalidate()
         
         # Return a success response with 200 status code
         return jsonify({
@@ -667,6 +1181,24 @@ def save_invoice():
             'success': True
         }), 200
         
+    except InsufficientStockError as e:
+        db.session.rollback()
+        logger.warning(f"Invoice rejected: {str(e)}")
+        return jsonify({
+            'status': 'error', 
+            'message': str(e),
+            'success': False
+        }), 409
+        
+    except InvalidInvoiceLineError as e:
+        db.session.rollback()
+        logger.warning(f"Invoice rejected: {str(e)}")
+        return jsonify({
+            'status': 'error', 
+            'message': str(e),
+            'success': False
+        }), 400
+        
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating invoice: {str(e)}")
@@ -693,8 +1225,14 @@ def update_invoice_status(invoice_id, status):
         abort(400)
     
     invoice = Invoice.query.get_or_404(invoice_id)
+    old_status = invoice.status
+    if status != old_status:
+        # Frozen PDFs are never evicted, so drop it before it goes stale
+        discard_frozen_pdf(invoice)
     invoice.status = status
+    record_status_change(invoice, old_status)
     db.session.commit()
+    dashboard_cache.invalidate()
     
     flash(f'Invoice status updated to {status}!', 'success')
     return redirect(url_for('view_invoice', invoice_id=invoice_id))
@@ -704,14 +1242,116 @@ def update_invoice_status(invoice_id, status):
 def generate_pdf(invoice_id):
     invoice = Invoice.query.get_or_404(invoice_id)
     
-    pdf_data = generate_invoice_pdf(invoice)
+    # Render in the background and return a job id straight away
+    if request.args.get('async'):
+        return _job_accepted(submit_job('invoice_pdf', {'invoice_id': invoice.id}, current_user.id))
+    
+    pdf_path, etag = get_invoice_pdf(invoice)
+    if pdf_path is None:
+        abort(500)
     
-    response = make_response(pdf_data)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=invoice_{invoice.invoice_number}.pdf'
+    # Served with an ETag so reprints revalidate with a 304 instead of a download
+    response = send_file(os.path.abspath(pdf_path),
+                         mimetype='application/pdf',
+                         as_attachment=True,
+                         download_name=f'invoice_{invoice.invoice_number}.pdf',
+                         etag=etag,
+                         conditional=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
     
     return response
 
+@app.route('/invoices/export')
+@login_required
+def export_invoices():
+    filters = _ledger_filters()
+    try:
+        start = _parse_date(filters['start']) if filters['start'] else None
+        end = _parse_date(filters['end']) if filters['end'] else None
+    except ValueError:
+        abort(400)
+    
+    # Export in the background and return a job id straight away
+    if request.args.get('async'):
+        return _job_accepted(submit_job('invoice_export', filters, current_user.id))
+    
+    invoice_ids = export_invoice_ids(start, end, filters['status'] or None)
+    if not invoice_ids:
+        flash('No invoices match the selected filters.', 'info')
+        return redirect(url_for('invoices', **{k: v for k, v in filters.items() if v}))
+    
+    response = Response(stream_with_context(stream_invoice_zip(invoice_ids)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f"attachment; filename=invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return response
+
+@job_handler('invoice_pdf')
+def _invoice_pdf_job(params):
+    invoice = db.session.get(Invoice, params['invoice_id'])
+    if invoice is None:
+        raise ValueError(f"Invoice {params['invoice_id']} not found")
+    pdf_path, _ = get_invoice_pdf(invoice)
+    if pdf_path is None:
+        raise RuntimeError(f"Could not render invoice {invoice.invoice_number}")
+    with open(pdf_path, 'rb') as f:
+        return f'invoice_{invoice.invoice_number}.pdf', 'application/pdf', f.read()
+
+@job_handler('invoice_export')
+def _invoice_export_job(params):
+    start = _parse_date(params['start']) if params.get('start') else None
+    end = _parse_date(params['end']) if params.get('end') else None
+    invoice_ids = export_invoice_ids(start, end, params.get('status') or None)
+    return 'invoices.zip', 'application/zip', stream_invoice_zip(invoice_ids)
+
+# Background Job Routes
+def _job_accepted(job_id):
+    return jsonify({
+        'status': 'queued',
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id)
+    }), 202
+
+def _get_user_job_or_404(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.created_by != current_user.id and not current_user.is_admin:
+        abort(404)
+    return job
+
+@app.route('/api/jobs', methods=['POST'])
+@login_required
+def submit_job_api():
+    data = request.get_json()
+    if not data or not data.get('kind'):
+        return jsonify({'status': 'error', 'message': 'Job kind is required'}), 400
+    
+    try:
+        job_id = submit_job(data['kind'], data.get('params') or {}, current_user.id)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    return _job_accepted(job_id)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    job = _get_user_job_or_404(job_id)
+    result = job_to_dict(job)
+    if job.status == 'done':
+        result['result_url'] = url_for('job_result', job_id=job.id)
+    return jsonify(result)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+@login_required
+def job_result(job_id):
+    job = _get_user_job_or_404(job_id)
+    if job.status != 'done' or not job.result_path or not os.path.exists(job.result_path):
+        abort(404)
+    
+    return send_file(os.path.abspath(job.result_path),
+                     mimetype=job.result_mimetype,
+                     as_attachment=True,
+                     download_name=job.result_name)
+
 # Jewelry Services Routes
 @app.route('/services')
 @login_required
@@ -798,93 +1438,120 @@ def delete_service(service_id):
     return redirect(url_for('services'))
 
 # Reports Routes
+def _build_report(report_type, start_date=None, end_date=None):
+    """Run one report and return its data, or None for an unknown type"""
+    report = REPORTS.get(report_type)
+    if report is None:
+        return None
+    date_range = DateRange(start_date, end_date or datetime.now())
+    report = report.for_range(date_range)
+    result = report.run(date_range)
+    
+    report_data = {
+        'type': report.name,
+        'title': report.title,
+        'period': report.period(date_range),
+        'data': result.rows,
+        'subtotals': result.subtotals,
+        'totals': result.totals
+    }
+    if report_type == 'sales':
+        report_data['total'] = result.totals['total_sales']
+    elif report_type == 'inventory':
+        report_data['total_items'] = result.totals['quantity']
+        report_data['total_value'] = result.totals['total_value']
+    elif report_type == 'valuation':
+        report_data['holdings'] = metal_holdings(report, result.rows)
+    return report_data
+
+def _export_report(report_type, fmt, start_date=None, end_date=None):
+    """Stream a report as CSV or XLSX chunks without loading every row.
+    
+    Rows are read `REPORT_EXPORT_BATCH` at a time (a server-side cursor on
+    MySQL) and written out as they arrive.
+    """
+    date_range = DateRange(start_date, end_date or datetime.now())
+    report = REPORTS[report_type].for_range(date_range)
+    query = report.rows_query(date_range)\
+        .execution_options(yield_per=REPORT_EXPORT_BATCH)
+    return stream_report(fmt, report.headers, db.session.execute(query), title=report.title)
+
+def _report_params(source):
+    """Report type, format and dates from request args or job params"""
+    report_type = source.get('report_type') or source.get('type')
+    fmt = source.get('format') or 'csv'
+    if report_type not in REPORTS or fmt not in REPORT_EXPORT_MIMETYPES:
+        raise ValueError(f"Unsupported report export: {report_type} as {fmt}")
+    start = source.get('start_date') or source.get('start')
+    end = source.get('end_date') or source.get('end')
+    return report_type, fmt, _parse_date(start) if start else None, _parse_date(end) if end else None
+
+@job_handler('report')
+def _report_job(params):
+    report_type, fmt, start_date, end_date = _report_params(params)
+    return (f"{report_type}_report.{fmt}", REPORT_EXPORT_MIMETYPES[fmt],
+            _export_report(report_type, fmt, start_date, end_date))
+
+@app.route('/reports/export')
+@login_required
+def export_report():
+    try:
+        report_type, fmt, start_date, end_date = _report_params(request.args)
+    except ValueError:
+        abort(400)
+    
+    response = Response(stream_with_context(_export_report(report_type, fmt, start_date, end_date)),
+                        mimetype=REPORT_EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={report_type}_report.{fmt}'
+    return response
+
 @app.route('/reports', methods=['GET', 'POST'])
 @login_required
 def reports():
     form = ReportForm()
     report_data = None
+    formatted_data = None
     
     if form.validate_on_submit():
         report_type = form.report_type.data
         start_date = form.start_date.data
-        end_date = form.end_date.data or datetime.now()
+        end_date = form.end_date.data
         
-        if report_type == 'sales':
-            # Generate sales report
-            query = db.session.query(
-                func.date(Invoice.issue_date).label('date'),
-                func.sum(Invoice.final_amount).label('total_sales'),
-                func.count(Invoice.id).label('invoice_count')
-            )
-            
-            if start_date:
-                query = query.filter(Invoice.issue_date >= start_date)
-            
-            results = query.filter(
-                Invoice.issue_date <= end_date,
-                Invoice.status == 'paid'
-            ).group_by(func.date(Invoice.issue_date)).order_by(func.date(Invoice.issue_date)).all()
-
+        # Run in the background and return a job id straight away
+        if request.args.get('async'):
+            job_id = submit_job('report', {
+                'report_type': report_type,
+                'format': request.args.get('format', 'csv'),
+                'start_date': start_date.strftime('%Y-%m-%d') if start_date else None,
+                'end_date': end_date.strftime('%Y-%m-%d') if end_date else None
+            }, current_user.id)
+            return _job_accepted(job_id)
+        
+        report_data = _build_report(report_type, start_date, end_date)
+        
+        if report_data and report_data['type'] == 'sales':
             # Format data for JSON serialization
-            formatted_data = [[row[0].strftime('%Y-%m-%d'), float(row[1]), row[2]] for row in results]
-            
-            report_data = {
-                'type': 'sales',
-                'title': 'Sales Report',
-                'period': f"{start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d')}",
-                'data': query.all(),
-                'total': db.session.query(func.sum(Invoice.final_amount))
-                    .filter(Invoice.status == 'paid')
-                    .filter(Invoice.issue_date <= end_date)
-                    .filter(Invoice.issue_date >= start_date if start_date else True).scalar() or 0
-            }
-            
-        elif report_type == 'inventory':
-            # Generate inventory report
-            query = db.session.query(
-                Product.name,
-                Product.barcode,
-                Category.name.label('category'),
-                Product.quantity,
-                Product.price,
-                (Product.price * Product.quantity).label('total_value')
-            ).join(Category)
-            
-            report_data = {
-                'type': 'inventory',
-                'title': 'Inventory Report',
-                'period': datetime.now().strftime('%Y-%m-%d'),
-                'data': query.all(),
-                'total_items': db.session.query(func.sum(Product.quantity)).scalar() or 0,
-                'total_value': db.session.query(func.sum(Product.price * Product.quantity)).scalar() or 0
-            }
-            
-        elif report_type == 'customers':
-            # Generate customer report
-            query = db.session.query(
-                Customer.name,
-                Customer.email,
-                Customer.phone,
-                func.count(Invoice.id).label('invoice_count'),
-                func.sum(Invoice.final_amount).label('total_spent')
-            ).outerjoin(Invoice).filter(
-                Invoice.status == 'paid' if start_date else True
-            ).group_by(Customer.id)
-            
-            if start_date:
-                query = query.filter(Invoice.issue_date >= start_date)
-            
-            if end_date:
-                query = query.filter(Invoice.issue_date <= end_date)
-                
-            report_data = {
-                'type': 'customers',
-                'title': 'Customer Report',
-                'period': f"{start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d')}",
-                'data': query.all()
-            }
+            formatted_data = [[row[0].strftime('%Y-%m-%d'), float(row[2]), row[1]] for row in report_data['data']]
     
     return render_template('reports.html', 
                          title='Reports',
                          form=form,
-                         report_data=report_data)
+                         report_data=report_data,
+                         formatted_data=formatted_data)
+
+# Debug Routes
+@app.route('/_debug/queries')
+@login_required
+def debug_queries():
+    """Query counts, database time and N+1 suspects of recent requests (admins only)"""
+    if not current_user.is_admin:
+        abort(404)
+    recent = recent_requests()
+    if request.args.get('suspects'):
+        recent = [r for r in recent if r['n_plus_one']]
+    if request.args.get('format') == 'json':
+        return jsonify({'status': 'success', 'requests': recent})
+    return render_template('debug_queries.html',
+                          title='Recent Queries',
+                          requests=recent,
+                          threshold=N_PLUS_ONE_THRESHOLD)
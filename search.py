@@ -0,0 +1,256 @@
+import re
+import logging
+import threading
+
+from sqlalchemy import text, select, func, or_, case, literal, Integer, Float
+from sqlalchemy.orm import joinedload
+
+from app import app, db
+from models import Product, Category, Supplier, Customer, normalize_name, normalize_phone
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Columns covered by the product search index, in index order
+SEARCH_COLUMNS = ('name', 'description', 'material', 'metal_type', 'stone_type', 'purity', 'barcode')
+
+# Only the first few terms of a query are used
+MAX_SEARCH_TERMS = 8
+
+# Phone lookups start once this many digits have been typed
+MIN_PHONE_DIGITS = 3
+
+
+def search_terms(query):
+    """Split a free-text query into lowercase word terms"""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_SEARCH_TERMS]
+
+
+class MySQLFullTextBackend:
+    """InnoDB FULLTEXT index queried in boolean mode with prefix terms"""
+
+    INDEX_NAME = 'ft_product_search'
+
+    def index_exists(self, conn):
+        return bool(conn.execute(text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'product' AND index_name = :name"
+        ), {'name': self.INDEX_NAME}).scalar())
+
+    def matches(self, terms):
+        # Every term must match, as a word prefix
+        against = ' '.join(f'+{term}*' for term in terms)
+        match = f"MATCH ({', '.join(SEARCH_COLUMNS)}) AGAINST (:against IN BOOLEAN MODE)"
+        return text(f"SELECT id, {match} AS score FROM product WHERE {match}")\
+            .bindparams(against=against)\
+            .columns(id=Integer, score=Float)\
+            .subquery('matches')
+
+
+class SQLiteFTS5Backend:
+    """External-content FTS5 table kept in sync with `product` by triggers"""
+
+    TABLE_NAME = 'product_fts'
+
+    # bm25 column weights: name and barcode hits rank above description hits
+    WEIGHTS = (10.0, 1.0, 2.0, 2.0, 2.0, 2.0, 10.0)
+
+    def index_exists(self, conn):
+        return bool(conn.execute(text(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = :name"
+        ), {'name': self.TABLE_NAME}).scalar())
+
+    def matches(self, terms):
+        expression = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(w) for w in self.WEIGHTS)
+        # bm25() is lower for better matches, so negate it into a score
+        return text(f"SELECT rowid AS id, -bm25(product_fts, {weights}) AS score "
+                    f"FROM product_fts WHERE product_fts MATCH :expression")\
+            .bindparams(expression=expression)\
+            .columns(id=Integer, score=Float)\
+            .subquery('matches')
+
+
+class LikeBackend:
+    """Unindexed fallback for other databases; ranks name matches first"""
+
+    def index_exists(self, conn):
+        return True
+
+    def matches(self, terms):
+        columns = [getattr(Product, c) for c in SEARCH_COLUMNS]
+        conditions = [or_(*[column.ilike(f'%{term}%') for column in columns]) for term in terms]
+        name_hits = sum((case((Product.name.ilike(f'%{term}%'), 1), else_=0) for term in terms), literal(0))
+        return select(Product.id.label('id'), (name_hits + 1).label('score'))\
+            .where(*conditions)\
+            .subquery('matches')
+
+
+SEARCH_BACKENDS = {
+    'mysql': MySQLFullTextBackend,
+    'sqlite': SQLiteFTS5Backend
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """The search backend for the configured database.
+
+    Only detects what is there: the FULLTEXT index and FTS5 table are
+    created by a migrate_db.py revision. Until that has run, searches fall
+    back to unindexed LIKE matching.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend = SEARCH_BACKENDS.get(db.engine.dialect.name, LikeBackend)()
+            with db.engine.connect() as conn:
+                if not backend.index_exists(conn):
+                    logger.warning("Product search index is missing; run `python migrate_db.py`. "
+                                   "Using unindexed search until this process restarts.")
+                    backend = LikeBackend()
+            _backend = backend
+        return _backend
+
+
+def product_filter(query):
+    """Condition matching products by word prefix or barcode substring.
+
+    Returns None for an empty query. Words match through the search index;
+    the barcode also matches anywhere within it, so part of a tag number
+    still finds the piece.
+    """
+    query = (query or '').strip()
+    if not query:
+        return None
+    barcode = Product.barcode.like('%' + _like_prefix(query), escape='\\')
+    terms = search_terms(query)
+    if not terms:
+        return barcode
+    matches = get_search_backend().matches(terms)
+    return or_(Product.id.in_(select(matches.c.id)), barcode)
+
+
+def _facet(matches, column, model, filters):
+    rows = db.session.query(model.id, model.name, func.count(Product.id))\
+        .select_from(Product)\
+        .join(matches, Product.id == matches.c.id)\
+        .join(model, column == model.id)\
+        .filter(*filters)\
+        .group_by(model.id, model.name)\
+        .order_by(func.count(Product.id).desc(), model.name)\
+        .all()
+    return [{'id': id_, 'name': name, 'count': count} for id_, name, count in rows]
+
+
+def search_products(query, category_id=None, supplier_id=None, page=1, per_page=20):
+    """Ranked full-text search over the product catalogue.
+
+    Returns a dict with the page of (product, score) results, the total
+    number of matches and category/supplier facet counts. Each facet is
+    counted with the other facet's filter applied, so picking a category
+    still shows how the matches split across suppliers.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return {'total': 0, 'results': [], 'facets': {'categories': [], 'suppliers': []}}
+
+    matches = get_search_backend().matches(terms)
+    category_filter = [Product.category_id == category_id] if category_id else []
+    supplier_filter = [Product.supplier_id == supplier_id] if supplier_id else []
+
+    results = db.session.query(Product, matches.c.score)\
+        .join(matches, Product.id == matches.c.id)\
+        .filter(*category_filter, *supplier_filter)
+
+    total = results.order_by(None).count()
+    rows = results.options(joinedload(Product.category))\
+        .order_by(matches.c.score.desc(), Product.id)\
+        .offset((page - 1) * per_page)\
+        .limit(per_page)\
+        .all()
+
+    return {
+        'total': total,
+        'results': rows,
+        'facets': {
+            'categories': _facet(matches, Product.category_id, Category, supplier_filter),
+            'suppliers': _facet(matches, Product.supplier_id, Supplier, category_filter)
+        }
+    }
+
+
+def _like_prefix(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _phone_condition(query):
+    """Indexed phone-prefix condition for a phone-looking query, else None"""
+    if not re.fullmatch(r'[\d\s+()-]+', query):
+        return None
+    digits = normalize_phone(query)
+    if len(digits) < MIN_PHONE_DIGITS:
+        return False
+    return Customer.phone_key.like(_like_prefix(digits), escape='\\')
+
+
+def _name_conditions(key):
+    """(whole-name prefix, later-word prefix) conditions on the name key"""
+    return (Customer.name_key.like(_like_prefix(key), escape='\\'),
+            Customer.name_key.like('% ' + _like_prefix(key), escape='\\'))
+
+
+def customer_filter(query):
+    """Condition matching customers by phone prefix or name/word prefix.
+
+    Returns None for an empty or too short query. Phone-looking queries
+    match the normalized phone key; anything else matches the normalized
+    name key by prefix, or by the prefix of a later word (surname).
+    """
+    query = (query or '').strip()
+    phone = _phone_condition(query)
+    if phone is not None:
+        return phone if phone is not False else None
+
+    key = normalize_name(query)
+    return or_(*_name_conditions(key)) if key else None
+
+
+def search_customers(query, limit=10):
+    """Top `limit` customers for a typeahead query.
+
+    Whole-name prefix matches come first and are a range scan on the name
+    index; surname matches, which can't use the index, are only looked up
+    when those don't fill the list.
+    """
+    query = (query or '').strip()
+    phone = _phone_condition(query)
+    if phone is not None:
+        if phone is False:
+            return []
+        return Customer.query.filter(phone).order_by(Customer.phone_key, Customer.id).limit(limit).all()
+
+    key = normalize_name(query)
+    if not key:
+        return []
+
+    name_prefix, word_prefix = _name_conditions(key)
+    found = Customer.query.filter(name_prefix).order_by(Customer.name_key, Customer.id).limit(limit).all()
+    if len(found) < limit:
+        found += Customer.query.filter(word_prefix, ~name_prefix)\
+            .order_by(Customer.name_key, Customer.id)\
+            .limit(limit - len(found))\
+            .all()
+    return found
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the contents of the product search index"""
+    backend = get_search_backend()
+    if isinstance(backend, SQLiteFTS5Backend):
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+    print(f"Product search index ready ({type(backend).__name__})")
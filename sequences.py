@@ -0,0 +1,117 @@
+import os
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import create_engine, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+
+from app import db
+from models import NumberSequence
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_reservation_engines = {}
+_reservation_engines_lock = threading.Lock()
+
+
+def _reservation_engine():
+    """An unpooled engine on the app's database for reservations.
+
+    A request already holds a pooled connection when it reserves a block.
+    If reservations also came from the pool, a threaded server with every
+    pooled connection held by requests waiting on the allocator's lock
+    would deadlock until the pool timed out.
+    """
+    with _reservation_engines_lock:
+        engine = _reservation_engines.get(db.engine.url)
+        if engine is None:
+            engine = create_engine(db.engine.url, poolclass=NullPool)
+            _reservation_engines[db.engine.url] = engine
+        return engine
+
+
+def reserve_block(name, size, start=1):
+    """Atomically reserve `size` consecutive values of the named sequence.
+
+    Runs in its own short transaction, independent of the caller's session,
+    so a reservation is never rolled back with a failed request. Values in a
+    reserved block that never get used are simply skipped. `start` may be a
+    callable taking the connection, evaluated only when the sequence is
+    created. Returns the first and last reserved values.
+    """
+    with _reservation_engine().begin() as conn:
+        bump = (
+            update(NumberSequence)
+            .where(NumberSequence.name == name)
+            .values(next_value=NumberSequence.next_value + size)
+        )
+        if not conn.execute(bump).rowcount:
+            if callable(start):
+                start = start(conn)
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(NumberSequence).values(name=name, next_value=start + size))
+                return start, start + size - 1
+            except IntegrityError:
+                # Another process created the sequence first
+                conn.execute(bump)
+
+        next_value = conn.execute(
+            select(NumberSequence.next_value).where(NumberSequence.name == name)
+        ).scalar_one()
+
+    return next_value - size, next_value - 1
+
+
+class BlockAllocator:
+    """Hands out sequence values from blocks reserved in the database.
+
+    Each process reserves `block_size` values at a time, so most calls never
+    touch the database. Values are unique across processes and increase
+    within a process, but interleave between processes and leave gaps when
+    a process exits with part of a block unused.
+    """
+
+    def __init__(self, block_size=20, start=1):
+        self.block_size = block_size
+        self.start = start
+        self._blocks = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def next_value(self, name):
+        with self._lock:
+            # A forked worker must not reuse blocks reserved by its parent
+            if self._pid != os.getpid():
+                self._blocks.clear()
+                self._pid = os.getpid()
+
+            block = self._blocks.get(name)
+            if block is None or block[0] > block[1]:
+                block = list(reserve_block(name, self.block_size, self.start))
+                self._blocks[name] = block
+                logger.debug(f"Reserved {name} values {block[0]}-{block[1]}")
+
+            value = block[0]
+            block[0] += 1
+            return value
+
+
+# Invoice numbers are allocated in blocks per process
+invoice_number_allocator = BlockAllocator(block_size=20)
+
+
+def financial_year(date):
+    """Return the Indian financial year (April-March) label, e.g. '2026-27'"""
+    start_year = date.year if date.month >= 4 else date.year - 1
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+
+def generate_invoice_number():
+    """Generate a unique invoice number from the current financial year's sequence"""
+    fy = financial_year(datetime.now())
+    number = invoice_number_allocator.next_value(f"invoice-{fy}")
+    return f"INV-{fy}-{number:06d}"
@@ -1,26 +1,14 @@
 // Customers page functionality
 
 document.addEventListener('DOMContentLoaded', function() {
-  // Customer search functionality
+  // Customer search: suggestions as you type, Enter searches server-side
   const customerSearch = document.getElementById('customerSearch');
-  if (customerSearch) {
-    customerSearch.addEventListener('input', function() {
-      const searchTerm = this.value.toLowerCase().trim();
-      const customerRows = document.querySelectorAll('.customer-row');
-      
-      customerRows.forEach(row => {
-        const customerName = row.dataset.name.toLowerCase();
-        const customerEmail = (row.dataset.email || '').toLowerCase();
-        const customerPhone = (row.dataset.phone || '').toLowerCase();
-        
-        if (customerName.includes(searchTerm) || 
-            customerEmail.includes(searchTerm) || 
-            customerPhone.includes(searchTerm)) {
-          row.classList.remove('d-none');
-        } else {
-          row.classList.add('d-none');
-        }
-      });
+  const customerSuggestions = document.getElementById('customerSuggestions');
+  const customerFilters = document.getElementById('customerFilters');
+  if (customerSearch && customerSuggestions && customerFilters) {
+    customerTypeahead(customerSearch, customerSuggestions, function(customer) {
+      customerSearch.value = customer.phone || customer.name;
+      customerFilters.submit();
     });
   }
   
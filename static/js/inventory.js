@@ -1,40 +1,16 @@
 // Inventory page functionality
 
 document.addEventListener('DOMContentLoaded', function() {
-  // Product category filter
-  const categoryFilter = document.getElementById('categoryFilter');
-  if (categoryFilter) {
-    categoryFilter.addEventListener('change', function() {
-      const selectedCategory = this.value;
-      const productRows = document.querySelectorAll('.product-row');
-
-      productRows.forEach(row => {
-        if (selectedCategory === 'all' || row.dataset.category === selectedCategory) {
-          row.classList.remove('d-none');
-        } else {
-          row.classList.add('d-none');
-        }
-      });
-    });
-  }
-
-  // Product search
-  const productSearch = document.getElementById('productSearch');
-  if (productSearch) {
-    productSearch.addEventListener('input', function() {
-      const searchTerm = this.value.toLowerCase().trim();
-      const productRows = document.querySelectorAll('.product-row');
-
-      productRows.forEach(row => {
-        const productName = row.dataset.name.toLowerCase();
-        const productBarcode = row.dataset.barcode.toLowerCase();
-
-        if (productName.includes(searchTerm) || productBarcode.includes(searchTerm)) {
-          row.classList.remove('d-none');
-        } else {
-          row.classList.add('d-none');
-        }
-      });
+  // Filters are applied server-side, so changing one reloads the page
+  const filterForm = document.getElementById('inventoryFilters');
+  if (filterForm) {
+    ['categoryFilter', 'stockFilter'].forEach(id => {
+      const select = document.getElementById(id);
+      if (select) {
+        select.addEventListener('change', function() {
+          filterForm.submit();
+        });
+      }
     });
   }
 
@@ -47,7 +23,7 @@ document.addEventListener('DOMContentLoaded', function() {
       if (quantity <= 0) {
         element.classList.add('bg-danger');
         element.textContent = 'Out of Stock';
-      } else if (quantity < 10) {
+      } else if (element.dataset.low === '1') {
         element.classList.add('bg-warning');
         element.textContent = 'Low Stock';
       } else {
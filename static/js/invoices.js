@@ -30,6 +30,19 @@ document.addEventListener('DOMContentLoaded', function() {
     console.error('Bootstrap is not loaded!');
   }
   
+  // Customers are looked up as you type rather than all rendered into the select
+  const customerLookup = document.getElementById('customerLookup');
+  const customerLookupSuggestions = document.getElementById('customerLookupSuggestions');
+  if (customerLookup && customerLookupSuggestions && customerSelect) {
+    customerTypeahead(customerLookup, customerLookupSuggestions, function(customer) {
+      if (!customerSelect.querySelector(`option[value="${customer.id}"]`)) {
+        customerSelect.add(new Option(customer.name, customer.id));
+      }
+      customerSelect.value = customer.id;
+      customerLookup.value = '';
+    });
+  }
+
   // Note: Modal handling is now in create_invoice.html directly
   // We don't need to handle the modal functionality here anymore
 
@@ -41,8 +54,56 @@ document.addEventListener('DOMContentLoaded', function() {
   // Array to store both products and services items
   let selectedItems = [];
 
+  // Service details rarely change, so they are cached for the life of the page
+  const serviceDetails = {};
+
+  async function fetchService(serviceId) {
+    if (!serviceDetails[serviceId]) {
+      const response = await fetch(`/api/service/${serviceId}`);
+      serviceDetails[serviceId] = await response.json();
+    }
+    return serviceDetails[serviceId];
+  }
+
+  // Add a searched-for item to a select that only lists recent items
+  function selectOption(select, value, text) {
+    if (!select.querySelector(`option[value="${value}"]`)) {
+      select.add(new Option(text, value));
+    }
+    select.value = value;
+  }
+
+  // Only recently used items are rendered; fetch their details in one call
+  async function prefetchDetails(select, url, key, cache) {
+    const ids = Array.from(select.options).map(option => option.value).filter(Boolean);
+    if (ids.length === 0) return;
+    try {
+      const response = await fetch(`${url}?ids=${ids.join(',')}`);
+      (await response.json())[key].forEach(item => cache(item));
+    } catch (error) {
+      console.error('Error prefetching item details:', error);
+    }
+  }
+
   // Service selection functionality
   if (serviceSelect && serviceQuantityInput && addServiceBtn) {
+    prefetchDetails(serviceSelect, '/api/services/batch', 'services', service => {
+      serviceDetails[service.id] = service;
+    });
+
+    const serviceLookup = document.getElementById('serviceLookup');
+    const serviceLookupSuggestions = document.getElementById('serviceLookupSuggestions');
+    if (serviceLookup && serviceLookupSuggestions) {
+      typeahead(serviceLookup, serviceLookupSuggestions, async function(query) {
+        const response = await fetch(`/api/services/search?q=${encodeURIComponent(query)}&limit=8`);
+        return (await response.json()).services;
+      }, service => `${service.name} - ${formatCurrency(service.price)}`, function(service) {
+        serviceDetails[service.id] = service;
+        selectOption(serviceSelect, service.id, `${service.name} - ${formatCurrency(service.price)}`);
+        serviceLookup.value = '';
+      });
+    }
+
     // Add service to invoice
     addServiceBtn.addEventListener('click', async function() {
       const serviceId = serviceSelect.value;
@@ -54,8 +115,7 @@ document.addEventListener('DOMContentLoaded', function() {
       }
 
       try {
-        const response = await fetch(`/api/service/${serviceId}`);
-        const service = await response.json();
+        const service = await fetchService(serviceId);
 
         // Check if service is already in the invoice
         const existingService = selectedItems.find(item => item.id === service.id && item.type === 'service');
@@ -125,15 +185,52 @@ document.addEventListener('DOMContentLoaded', function() {
     });
   }
 
+  // Product details are reused for a short while; stock moves with every sale
+  const PRODUCT_DETAILS_TTL = 30000;
+  const productDetails = {};
+
+  function rememberProduct(product) {
+    productDetails[product.id] = { product: product, fetchedAt: Date.now() };
+  }
+
+  async function fetchProduct(productId) {
+    const cached = productDetails[productId];
+    if (cached && Date.now() - cached.fetchedAt < PRODUCT_DETAILS_TTL) {
+      return cached.product;
+    }
+    const response = await fetch(`/api/product/${productId}`);
+    const product = await response.json();
+    rememberProduct(product);
+    return product;
+  }
+
+  function productLabel(product) {
+    return `${product.name} (${product.barcode}) - ${formatCurrency(product.price)}`;
+  }
+
   if (productSelect && quantityInput && addProductBtn) {
+    prefetchDetails(productSelect, '/api/products/batch', 'products', rememberProduct);
+
+    const productLookup = document.getElementById('productLookup');
+    const productLookupSuggestions = document.getElementById('productLookupSuggestions');
+    if (productLookup && productLookupSuggestions) {
+      typeahead(productLookup, productLookupSuggestions, async function(query) {
+        const response = await fetch(`/api/products/search?q=${encodeURIComponent(query)}&per_page=8`);
+        return (await response.json()).products;
+      }, product => `${productLabel(product)} - ${product.quantity} in stock`, function(product) {
+        selectOption(productSelect, product.id, productLabel(product));
+        productLookup.value = '';
+        productSelect.dispatchEvent(new Event('change'));
+      });
+    }
+
     // Get product details when a product is selected
     productSelect.addEventListener('change', async function() {
       const productId = this.value;
       if (!productId) return;
 
       try {
-        const response = await fetch(`/api/product/${productId}`);
-        const product = await response.json();
+        const product = await fetchProduct(productId);
 
         // Update available quantity info
         const quantityInfo = document.getElementById('availableQuantity');
@@ -161,6 +258,39 @@ document.addEventListener('DOMContentLoaded', function() {
       }
     });
 
+    // Scanning a tag adds one piece of that product
+    const barcodeScanInput = document.getElementById('barcodeScanInput');
+    const barcodeScanError = document.getElementById('barcodeScanError');
+    if (barcodeScanInput) {
+      barcodeScanInput.addEventListener('keydown', async function(e) {
+        if (e.key !== 'Enter') return;
+        e.preventDefault();
+
+        const code = this.value.trim();
+        if (!code) return;
+        this.value = '';
+        barcodeScanError.textContent = '';
+
+        try {
+          const response = await fetch(`/api/product/by-barcode/${encodeURIComponent(code)}`);
+          if (!response.ok) {
+            barcodeScanError.textContent = `No product with barcode ${code}`;
+            return;
+          }
+          const product = await response.json();
+          rememberProduct(product);
+
+          selectOption(productSelect, product.id, productLabel(product));
+          quantityInput.disabled = false;
+          quantityInput.value = 1;
+          addProductBtn.disabled = false;
+          addProductBtn.click();
+        } catch (error) {
+          console.error('Error looking up barcode:', error);
+        }
+      });
+    }
+
     // Add product to invoice
     addProductBtn.addEventListener('click', async function() {
       const productId = productSelect.value;
@@ -172,8 +302,8 @@ document.addEventListener('DOMContentLoaded', function() {
       }
 
       try {
-        const response = await fetch(`/api/product/${productId}`);
-        const product = await response.json();
+        const product = await fetchProduct(productId);
+        delete productDetails[productId];
 
         // Check if quantity is valid
         if (quantity > product.available_quantity) {
@@ -217,8 +347,11 @@ document.addEventListener('DOMContentLoaded', function() {
           // Create new row in the table
           const newRow = document.createElement('tr');
           newRow.id = `item-row-product-${product.id}`;
+          const barcodeImage = product.barcode
+            ? `<br><img src="/barcode/${encodeURIComponent(product.barcode)}.svg" alt="${product.barcode}" height="24">`
+            : '';
           newRow.innerHTML = `
-            <td>${product.name}</td>
+            <td>${product.name}${barcodeImage}</td>
             <td>Product</td>
             <td class="item-quantity">${quantity}</td>
             <td>${formatCurrency(product.price)}</td>
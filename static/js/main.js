@@ -57,6 +57,65 @@ function confirmDelete(message, deleteFormId) {
   }
 }
 
+// Typeahead: shows server-side matches under `input` as the user types.
+// `search(query)` resolves to a list of items, `label(item)` renders one.
+function typeahead(input, suggestions, search, label, onSelect) {
+  let timer = null;
+  let lastQuery = '';
+
+  function hide() {
+    suggestions.classList.add('d-none');
+    suggestions.innerHTML = '';
+  }
+
+  input.addEventListener('input', function() {
+    clearTimeout(timer);
+    const query = this.value.trim();
+    if (query.length < 2) {
+      hide();
+      return;
+    }
+
+    timer = setTimeout(async function() {
+      lastQuery = query;
+      try {
+        const items = await search(query);
+        // Ignore responses for queries the user has already typed past
+        if (query !== lastQuery) return;
+
+        suggestions.innerHTML = '';
+        items.forEach(item => {
+          const option = document.createElement('button');
+          option.type = 'button';
+          option.className = 'list-group-item list-group-item-action';
+          option.textContent = label(item);
+          option.addEventListener('click', function() {
+            hide();
+            onSelect(item);
+          });
+          suggestions.appendChild(option);
+        });
+        suggestions.classList.toggle('d-none', items.length === 0);
+      } catch (error) {
+        console.error('Typeahead search failed:', error);
+      }
+    }, 200);
+  });
+
+  input.addEventListener('blur', function() {
+    // Let a click on a suggestion land before hiding the list
+    setTimeout(hide, 200);
+  });
+}
+
+// Customer typeahead backed by /api/customers/search
+function customerTypeahead(input, suggestions, onSelect) {
+  typeahead(input, suggestions, async function(query) {
+    const response = await fetch(`/api/customers/search?q=${encodeURIComponent(query)}&limit=8`);
+    return (await response.json()).customers;
+  }, customer => customer.phone ? `${customer.name} (${customer.phone})` : customer.name, onSelect);
+}
+
 // Initialize tooltips and popovers
 document.addEventListener('DOMContentLoaded', function() {
   // Initialize tooltips
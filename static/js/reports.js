@@ -67,50 +67,6 @@ document.addEventListener('DOMContentLoaded', function() {
       });
     }
   }
-  
-  // Export report functionality
-  const exportReportBtn = document.getElementById('exportReportBtn');
-  if (exportReportBtn) {
-    exportReportBtn.addEventListener('click', function() {
-      const reportTable = document.getElementById('reportTable');
-      if (!reportTable) return;
-      
-      // Get table data
-      const headers = [];
-      const data = [];
-      
-      // Get headers
-      reportTable.querySelectorAll('thead th').forEach(th => {
-        headers.push(th.textContent);
-      });
-      
-      // Get rows
-      reportTable.querySelectorAll('tbody tr').forEach(tr => {
-        const rowData = [];
-        tr.querySelectorAll('td').forEach(td => {
-          rowData.push(td.textContent);
-        });
-        data.push(rowData);
-      });
-      
-      // Prepare CSV content
-      let csvContent = headers.join(',') + '\n';
-      data.forEach(row => {
-        csvContent += row.join(',') + '\n';
-      });
-      
-      // Create download link
-      const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-      const url = URL.createObjectURL(blob);
-      const link = document.createElement('a');
-      link.setAttribute('href', url);
-      link.setAttribute('download', 'report.csv');
-      link.style.visibility = 'hidden';
-      document.body.appendChild(link);
-      link.click();
-      document.body.removeChild(link);
-    });
-  }
 });
 
 // Helper function to format date
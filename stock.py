@@ -0,0 +1,84 @@
+import logging
+from collections import defaultdict
+
+from sqlalchemy import case, update
+
+from app import db
+from models import Product
+from valuation import record_stock_change
+from ledger import record_movements
+from reorder import refresh_products
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStockError(Exception):
+    """Raised when an invoice asks for more pieces than are in stock"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        names = ', '.join(shortages)
+        super().__init__(f"Insufficient stock for: {names}")
+
+
+class InvalidInvoiceLineError(ValueError):
+    """Raised for an invoice line that can never be fulfilled: a bad quantity or an unknown product"""
+
+
+def sold_quantities(items):
+    """Sum the quantities per product for the non-service lines of an invoice"""
+    quantities = defaultdict(int)
+    for item in items:
+        if item.get('is_service', False):
+            continue
+        try:
+            product_id, quantity = int(item['product_id']), int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidInvoiceLineError(f"Invalid product line: {item!r}")
+        if quantity <= 0:
+            raise InvalidInvoiceLineError(f"Invalid quantity {quantity} for product {product_id}")
+        quantities[product_id] += quantity
+    return dict(quantities)
+
+
+def decrement_stock(quantities, invoice_id=None):
+    """Take `quantities` ({product_id: pieces}) out of stock in one statement.
+
+    The update only touches rows that still hold enough pieces, so concurrent
+    sales of the last piece cannot both succeed. If any product falls short
+    the caller's transaction must be rolled back. The sale is written to the
+    stock ledger against `invoice_id`. Returns the products involved, loaded
+    in a single query.
+    """
+    if not quantities:
+        return {}
+
+    product_ids = list(quantities)
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(product_ids)).all()}
+    unknown = [pid for pid in product_ids if pid not in products]
+    if unknown:
+        raise InvalidInvoiceLineError(f"Unknown product id(s): {', '.join(map(str, unknown))}")
+
+    requested = case(quantities, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids), Product.quantity >= requested)
+        .values(quantity=Product.quantity - requested)
+        .execution_options(synchronize_session=False)
+    )
+
+    if result.rowcount != len(product_ids):
+        # Report from the quantities read just before the update; if a concurrent
+        # sale won the race they may still look sufficient, so name every line
+        shortages = [products[pid].name for pid in product_ids
+                     if (products[pid].quantity or 0) < quantities[pid]]
+        raise InsufficientStockError(shortages or [products[pid].name for pid in product_ids])
+
+    record_stock_change(products, quantities)
+    record_movements('sale', {pid: -pieces for pid, pieces in quantities.items()}, invoice_id=invoice_id)
+    refresh_products(quantities)
+    for product in products.values():
+        db.session.expire(product, ['quantity'])
+
+    return products
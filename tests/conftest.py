@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# Tests never touch the configured database: they run against
+# TEST_DATABASE_URL, or a throwaway SQLite file
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix='invento-tests-'), 'test.db')
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL', f"sqlite:///{DB_FILE}")
+
+from app import app as flask_app, db  # noqa: E402
+from migrate_db import run_migrations  # noqa: E402
+
+run_migrations()
+flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+PASSWORD = 'password'
+
+
+@pytest.fixture(scope='session')
+def app():
+    return flask_app
+
+
+@pytest.fixture(scope='session')
+def user(app):
+    from models import User
+    with app.app_context():
+        user = User(username='tester', email='tester@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return {'id': user.id, 'email': user.email}
+
+
+@pytest.fixture
+def login(app, user):
+    """Returns a function making a new logged-in test client, one per thread"""
+    def make_client():
+        client = app.test_client()
+        client.post('/login', data={'email': user['email'], 'password': PASSWORD})
+        return client
+    return make_client
@@ -0,0 +1,39 @@
+import uuid
+
+import pytest
+
+from app import db
+from models import Customer, normalize_phone
+
+
+@pytest.mark.parametrize('written, key', [
+    ('+91 98765 43210', '9876543210'),
+    ('098765 43210', '9876543210'),
+    ('919876543210', '9876543210'),
+    ('0091-98765-43210', '9876543210'),
+    ('9198765432', '9198765432'),
+    ('022-1234567', '221234567'),
+    ('+91 22 1234567', '221234567'),
+    ('', ''),
+])
+def test_normalize_phone(written, key):
+    assert normalize_phone(written) == key
+
+
+@pytest.fixture
+def landline_customer(app):
+    name = f'Landline {uuid.uuid4().hex[:8]}'
+    with app.app_context():
+        db.session.add(Customer(name=name, phone='022-1234567'))
+        db.session.commit()
+    return name
+
+
+@pytest.mark.parametrize('query', ['022-1234567', '0221234567', '221234567', '+91 22 123'])
+def test_landline_is_found_however_it_is_typed(login, landline_customer, query):
+    client = login()
+    found = client.get('/api/customers/search', query_string={'q': query}).json['customers']
+    assert landline_customer in [customer['name'] for customer in found]
+
+    page = client.get('/customers', query_string={'q': query})
+    assert landline_customer.encode() in page.data
@@ -0,0 +1,45 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from models import Category, Product
+
+
+@pytest.fixture
+def category(app):
+    """A category holding one product per stock state, none of them low by default"""
+    with app.app_context():
+        category = Category(name=f'Chains {uuid.uuid4().hex[:8]}', reorder_level=0)
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([
+            Product(name='Sold out chain', price=Decimal('10.00'), quantity=0, category_id=category.id),
+            Product(name='Stocked chain', price=Decimal('10.00'), quantity=3, category_id=category.id),
+            Product(name='Low chain', price=Decimal('10.00'), quantity=2, reorder_level=5,
+                    category_id=category.id),
+        ])
+        db.session.commit()
+        return category.id
+
+
+@pytest.mark.parametrize('stock, names', [
+    ('in', ['Stocked chain']),
+    ('low', ['Low chain']),
+    ('out', ['Sold out chain']),
+])
+def test_stock_filters(login, category, stock, names):
+    response = login().get('/api/inventory', query_string={'category': category, 'stock': stock})
+    assert sorted(product['name'] for product in response.json['products']) == names
+
+
+def test_search_matches_part_of_a_barcode(app, login, category):
+    barcode = f'{uuid.uuid4().int % 100000:05d}'
+    with app.app_context():
+        db.session.add(Product(name='Tagged chain', price=Decimal('10.00'), quantity=1, barcode=barcode,
+                               category_id=category))
+        db.session.commit()
+
+    response = login().get('/api/inventory', query_string={'category': category, 'q': barcode[1:4]})
+    assert [product['name'] for product in response.json['products']] == ['Tagged chain']
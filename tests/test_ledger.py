@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from app import db
+from ledger import move_stock, stock_as_of, take_checkpoint
+from models import Product, StockCheckpoint
+
+
+def test_stock_as_of_replays_movements_after_the_checkpoint(app):
+    with app.app_context():
+        product = Product(name=f'Bangle {uuid.uuid4().hex[:8]}', price=Decimal('50.00'), quantity=4)
+        db.session.add(product)
+        db.session.commit()
+
+        checkpoint_at = take_checkpoint()
+        checkpoint = db.session.scalars(db.select(StockCheckpoint)
+                                        .where(StockCheckpoint.checkpoint_at == checkpoint_at)).one()
+        assert {item.product_id: item.quantity for item in checkpoint.items}[product.id] == 4
+
+        move_stock(product, 'sale', -3)
+        db.session.commit()
+
+        assert stock_as_of(checkpoint_at, [product.id]) == (checkpoint_at, {product.id: 4})
+        assert stock_as_of(datetime.utcnow(), [product.id]) == (checkpoint_at, {product.id: 1})
@@ -0,0 +1,38 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from report_engine import REPORTS, DateRange, rollup_supported
+
+
+def _mysql(version, mariadb=False):
+    dialect = mysql.dialect()
+    dialect.server_version_info = version
+    dialect.is_mariadb = mariadb
+    return dialect
+
+
+def test_inventory_rollup_compiles_for_mysql():
+    sql = str(REPORTS['inventory'].rollup_query().compile(dialect=_mysql((8, 0, 36))))
+    assert 'GROUP BY category.name, product.id WITH ROLLUP ORDER BY product.id' in sql
+    assert 'grouping(product.id)' in sql.lower()
+
+
+def test_sales_rollup_compiles_for_mysql():
+    query = REPORTS['sales'].rollup_query(DateRange(date(2026, 4, 1), date(2026, 4, 30)))
+    sql = str(query.compile(dialect=_mysql((8, 0, 36))))
+    assert 'WITH ROLLUP ORDER BY' in sql
+    assert 'ROLLUP(' not in sql
+
+
+@pytest.mark.parametrize('dialect, supported', [
+    (_mysql((8, 0, 12)), True),
+    (_mysql((8, 0, 11)), False),
+    (_mysql((5, 7, 44)), False),
+    (_mysql((10, 11, 6), mariadb=True), False),
+    (postgresql.dialect(), True),
+    (sqlite.dialect(), False),
+])
+def test_rollup_needs_mysql_8_0_12(dialect, supported):
+    assert rollup_supported(dialect) == supported
@@ -0,0 +1,23 @@
+import csv
+import io
+import zipfile
+from decimal import Decimal
+
+from report_export import stream_csv, stream_xlsx
+
+ROWS = [['=HYPERLINK("http://example.com")', '+91 98765 43210', '@SUM(A1)', '-2+3', Decimal('-5.00'), 'Ring']]
+
+
+def test_csv_quotes_text_that_would_be_a_formula():
+    data = b''.join(stream_csv(['Name', 'Phone', 'Note', 'Code', 'Amount', 'Item'], ROWS)).decode()
+    assert list(csv.reader(io.StringIO(data)))[1] == [
+        '\'=HYPERLINK("http://example.com")', "'+91 98765 43210", "'@SUM(A1)", "'-2+3", '-5.00', 'Ring']
+
+
+def test_xlsx_quotes_text_that_would_be_a_formula():
+    data = b''.join(stream_xlsx(['Name', 'Phone', 'Note', 'Code', 'Amount', 'Item'], ROWS))
+    sheet = zipfile.ZipFile(io.BytesIO(data)).read('xl/worksheets/sheet1.xml').decode()
+    assert '<t xml:space="preserve">\'=HYPERLINK("http://example.com")</t>' in sheet
+    assert '<t xml:space="preserve">\'+91 98765 43210</t>' in sheet
+    assert '<c r="E2"><v>-5.00</v></c>' in sheet
+    assert '<t xml:space="preserve">Ring</t>' in sheet
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import uuid
+
+WORKERS = 4
+DRAWS = 60
+
+
+def _draw(sequence, count, start, results):
+    """Runs in a fresh process: draw `count` values the way a web worker would"""
+    from app import app
+    from sequences import BlockAllocator, generate_invoice_number
+
+    # Small blocks so the workers keep coming back to the database together
+    allocator = BlockAllocator(block_size=3)
+    with app.app_context():
+        start.wait(timeout=60)
+        values = [allocator.next_value(sequence) for _ in range(count)]
+        invoice_numbers = [generate_invoice_number() for _ in range(count)]
+    results.put((os.getpid(), values, invoice_numbers))
+
+
+def _run_workers(sequence):
+    # spawn gives each worker its own interpreter, connections and allocator
+    context = multiprocessing.get_context('spawn')
+    start, results = context.Barrier(WORKERS), context.Queue()
+    workers = [context.Process(target=_draw, args=(sequence, DRAWS, start, results))
+               for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    try:
+        collected = [results.get(timeout=120) for _ in workers]
+    finally:
+        # A worker that failed leaves the others at the barrier, which then
+        # times out; don't leave anything running past the test
+        for worker in workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+    assert [worker.exitcode for worker in workers] == [0] * WORKERS
+    return collected
+
+
+def test_values_are_unique_across_processes_and_increase_within_each():
+    results = _run_workers(f'test-{uuid.uuid4().hex[:8]}')
+    assert len({pid for pid, _, _ in results}) == WORKERS
+
+    values = [value for _, worker_values, _ in results for value in worker_values]
+    assert len(values) == len(set(values)) == WORKERS * DRAWS
+
+    invoice_numbers = [number for _, _, numbers in results for number in numbers]
+    assert len(invoice_numbers) == len(set(invoice_numbers)) == WORKERS * DRAWS
+
+    for _, worker_values, worker_numbers in results:
+        assert worker_values == sorted(worker_values)
+        serials = [int(number.rsplit('-', 1)[1]) for number in worker_numbers]
+        assert serials == sorted(serials)
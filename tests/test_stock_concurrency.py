@@ -0,0 +1,75 @@
+import threading
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from models import Category, Customer, Product, Supplier
+
+STOCK = 5
+BUYERS = 20
+
+
+@pytest.fixture
+def product(app):
+    """A customer and a product with STOCK pieces, unique to each test"""
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        category = Category(name=f'Rings {tag}')
+        supplier = Supplier(name=f'Supplier {tag}')
+        customer = Customer(name=f'Customer {tag}')
+        db.session.add_all([category, supplier, customer])
+        db.session.flush()
+        product = Product(name=f'Ring {tag}', price=Decimal('100.00'), quantity=STOCK,
+                          category_id=category.id, supplier_id=supplier.id)
+        db.session.add(product)
+        db.session.commit()
+        return {'id': product.id, 'customer_id': customer.id}
+
+
+def _invoice(product, quantity=1, product_id=None):
+    return {
+        'customer_id': product['customer_id'], 'issue_date': '2026-10-05', 'due_date': '',
+        'total_amount': '100', 'tax_amount': '0', 'discount': '0', 'final_amount': '100', 'notes': '',
+        'items': [{'product_id': product_id or product['id'], 'quantity': quantity,
+                   'unit_price': '100', 'total_price': '100'}]
+    }
+
+
+def _quantity(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).quantity
+
+
+def test_parallel_sales_never_oversell(app, login, product):
+    clients = [login() for _ in range(BUYERS)]
+    start = threading.Barrier(BUYERS)
+    statuses = []
+
+    def buy(client):
+        start.wait()
+        statuses.append(client.post('/invoice/save', json=_invoice(product)).status_code)
+
+    threads = [threading.Thread(target=buy, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(200) == STOCK
+    assert statuses.count(409) == BUYERS - STOCK
+    assert _quantity(app, product['id']) == 0
+
+
+@pytest.mark.parametrize('quantity', [0, -2, 'two'])
+def test_invalid_quantity_is_a_bad_request(app, login, product, quantity):
+    response = login().post('/invoice/save', json=_invoice(product, quantity=quantity))
+    assert response.status_code == 400
+    assert _quantity(app, product['id']) == STOCK
+
+
+def test_unknown_product_is_a_bad_request(app, login, product):
+    response = login().post('/invoice/save', json=_invoice(product, product_id=10 ** 9))
+    assert response.status_code == 400
+    assert 'Unknown product' in response.get_json()['message']
@@ -1,7 +1,7 @@
 import io
 import os
 import logging
-from datetime import datetime
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -11,6 +11,8 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus.flowables import Flowable
 from reportlab.pdfgen import canvas
+from reportlab.lib.utils import ImageReader
+from PIL import Image as PILImage
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -37,10 +39,8 @@ try:
 except Exception as e:
     logger.warning(f"Font registration error: {str(e)}")
 
-def generate_invoice_number():
-    """Generate a unique invoice number based on timestamp"""
-    now = datetime.now()
-    return f"INV-{now.strftime('%Y%m%d')}-{now.strftime('%H%M%S')}"
+# Bump whenever the invoice PDF layout changes so cached PDFs are re-rendered
+PDF_RENDERER_VERSION = 1
 
 # Watermark class to add logo as a background
 class Watermark(Flowable):
@@ -98,88 +98,34 @@ class Watermark(Flowable):
         
         canvas.restoreState()
 
-class WatermarkDocTemplate(SimpleDocTemplate):
-    def __init__(self, *args, **kwargs):
-        SimpleDocTemplate.__init__(self, *args, **kwargs)
-            
-    def build(self, flowables, **kwargs):
-        # Add watermark to each page
-        self._calc()  # Calculate the document layout
-        frame = Frame(self.leftMargin, self.bottomMargin,
-                      self.width, self.height, id='normal')
-        
-        template = []
-        
-        def add_watermark(canvas, doc):
-            canvas.saveState()
-            # Try to use the logo image as watermark
+# Rendering context, resolved once per process and shared by every invoice PDF
+LOGO_PATHS = [
+    'static/images/logo.png',
+    'static/img/logo.png',
+    'static/logo.png',
+    'logo.png'
+]
+
+# The watermark is drawn 450pt square; ~940px keeps it at 150 dpi in print
+WATERMARK_SIZE = 450
+WATERMARK_PIXELS = 940
+WATERMARK_FORM = 'watermark'
+
+def _load_watermark_image():
+    """Find the logo and decode it once, downscaled to the size it is drawn at"""
+    for path in LOGO_PATHS:
+        if os.path.exists(path):
             try:
-                # Check for logo file in multiple possible locations
-                logo_paths = [
-                    'static/images/logo.png',
-                    'static/img/logo.png',
-                    'static/logo.png',
-                    'logo.png'
-                ]
-                
-                logo_file = None
-                for path in logo_paths:
-                    if os.path.exists(path):
-                        logger.info(f"Found logo file at: {path}")
-                        logo_file = path
-                        break
-                    else:
-                        logger.info(f"Logo file not found at: {path}")
-                
-                if logo_file:
-                    # Get page dimensions
-                    page_width, page_height = A4
-                    
-                    # First, we'll draw the image with proper opacity
-                    # Without the additional white overlay
-                    canvas.saveState()
-                    
-                    # Set the blend mode for the entire canvas
-                    # This makes everything drawn on top blend with what's underneath
-                    canvas.setFillAlpha(0.25)  # Make the watermark 25% opaque (more visible)
-                    
-                    # Draw the logo larger for better visibility
-                    canvas.drawImage(
-                        logo_file, 
-                        x=(page_width - 450) / 2,  # Center horizontally
-                        y=(page_height - 450) / 2,  # Center vertically
-                        width=450,                 # Larger size
-                        height=450,
-                        mask='auto',
-                        preserveAspectRatio=True
-                    )
-                    
-                    canvas.restoreState()
-                else:
-                    # Fallback to text watermark
-                    canvas.setFont('Helvetica-Bold', 90)
-                    canvas.setFillColorRGB(0.8, 0.8, 0.8)  # Medium gray
-                    canvas.setFillAlpha(0.2)  # 20% opacity (more visible)
-                    text = "SGV Jewellers"
-                    canvas.drawCentredString(page_width/2, page_height/2, text)
+                image = PILImage.open(path)
+                image.thumbnail((WATERMARK_PIXELS, WATERMARK_PIXELS))
+                logger.info(f"Loaded watermark logo from: {path}")
+                return ImageReader(image)
             except Exception as e:
-                logger.warning(f"Could not add watermark: {str(e)}")
-                logger.exception(e)
-            
-            canvas.restoreState()
-            
-        template.append(frame)
-        SimpleDocTemplate.build(self, flowables, onFirstPage=add_watermark, onLaterPages=add_watermark, **kwargs)
+                logger.warning(f"Could not load watermark logo from {path}: {str(e)}")
+    logger.info("No logo file found, using text watermark")
+    return None
 
-def generate_invoice_pdf(invoice):
-    """Generate a PDF for the given invoice"""
-    buffer = io.BytesIO()
-    
-    # Use A4 size which is more standard for invoices
-    doc = WatermarkDocTemplate(buffer, pagesize=A4, 
-                           leftMargin=20*mm, rightMargin=20*mm,
-                           topMargin=20*mm, bottomMargin=20*mm)
-    
+def _build_invoice_styles():
     styles = getSampleStyleSheet()
     
     # Create custom styles with better font settings
@@ -240,6 +186,75 @@ def generate_invoice_pdf(invoice):
         textColor=colors.green
     ))
     
+    styles.add(ParagraphStyle(
+        name='Footer',
+        parent=styles['Normal'],
+        fontSize=7,
+        textColor=colors.gray,
+        alignment=1  # Center alignment
+    ))
+    
+    return styles
+
+# Store image streams as raw binary; pure-Python ASCII85 encoding of the
+# watermark used to dominate render time
+rl_config.useA85 = 0
+
+WATERMARK_IMAGE = _load_watermark_image()
+INVOICE_STYLES = _build_invoice_styles()
+
+def _draw_watermark(canvas):
+    page_width, page_height = A4
+    
+    if WATERMARK_IMAGE:
+        # Make the watermark 25% opaque
+        canvas.setFillAlpha(0.25)
+        canvas.drawImage(
+            WATERMARK_IMAGE,
+            x=(page_width - WATERMARK_SIZE) / 2,  # Center horizontally
+            y=(page_height - WATERMARK_SIZE) / 2,  # Center vertically
+            width=WATERMARK_SIZE,
+            height=WATERMARK_SIZE,
+            mask='auto',
+            preserveAspectRatio=True
+        )
+    else:
+        # Fallback to text watermark
+        canvas.setFont('Helvetica-Bold', 90)
+        canvas.setFillColorRGB(0.8, 0.8, 0.8)  # Medium gray
+        canvas.setFillAlpha(0.2)  # 20% opacity
+        canvas.drawCentredString(page_width/2, page_height/2, "SGV Jewellers")
+
+def add_watermark(canvas, doc):
+    """Page callback: the watermark is defined once per document as a form XObject"""
+    canvas.saveState()
+    try:
+        if not canvas.hasForm(WATERMARK_FORM):
+            canvas.beginForm(WATERMARK_FORM)
+            _draw_watermark(canvas)
+            canvas.endForm()
+        canvas.doForm(WATERMARK_FORM)
+    except Exception as e:
+        logger.warning(f"Could not add watermark: {str(e)}")
+    canvas.restoreState()
+
+class WatermarkDocTemplate(SimpleDocTemplate):
+    def build(self, flowables, **kwargs):
+        SimpleDocTemplate.build(self, flowables, onFirstPage=add_watermark, onLaterPages=add_watermark, **kwargs)
+
+def generate_invoice_pdf(invoice):
+    """Generate a PDF for the given invoice"""
+    buffer = io.BytesIO()
+    
+    # Use A4 size which is more standard for invoices
+    doc = WatermarkDocTemplate(buffer, pagesize=A4, 
+                           leftMargin=20*mm, rightMargin=20*mm,
+                           topMargin=20*mm, bottomMargin=20*mm)
+    
+    styles = INVOICE_STYLES
+    font_name = 'Helvetica'
+    bold_font = 'Helvetica-Bold'
+    
     # Add content
     elements = []
     
@@ -451,14 +466,7 @@ def generate_invoice_pdf(invoice):
     
     # Add footer with developer info
     elements.append(Spacer(1, 20*mm))
-    dev_info = Paragraph("Developed by Team InVenTO - The Inventory Management Systems", 
-                      ParagraphStyle(
-                          name='Footer',
-                          parent=styles['Normal'],
-                          fontSize=7,
-                          textColor=colors.gray,
-                          alignment=1  # Center alignment
-                      ))
+    dev_info = Paragraph("Developed by Team InVenTO - The Inventory Management Systems", styles['Footer'])
     elements.append(dev_info)
     
     # Build the document
@@ -0,0 +1,241 @@
+import logging
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import event, func, insert, select, delete, update, literal, Date
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from app import app, db
+from models import Product, InventoryValuation, InventoryValuationSnapshot
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Product columns that decide which bucket a product counts in, and how much
+VALUED_ATTRIBUTES = ('quantity', 'price', 'cost_price', 'weight', 'category_id', 'metal_type', 'purity')
+
+MEASURES = ('units', 'retail_value', 'cost_value', 'gross_weight')
+
+
+def bucket_key(category_id, metal_type, purity):
+    """The inventory_valuation key for a product's category, metal and purity"""
+    return (category_id or 0, metal_type or '', purity or '')
+
+
+def contribution(values, units=None):
+    """(bucket, {measure: amount}) for one product's stock.
+
+    `values` maps VALUED_ATTRIBUTES to their values; `units` overrides the
+    quantity, e.g. to value a number of pieces sold.
+    """
+    units = (values['quantity'] or 0) if units is None else units
+    return bucket_key(values['category_id'], values['metal_type'], values['purity']), {
+        'units': units,
+        'retail_value': Decimal(values['price'] or 0) * units,
+        'cost_value': Decimal(values['cost_price'] or 0) * units,
+        'gross_weight': Decimal(values['weight'] or 0) * units,
+    }
+
+
+def _product_values(product, old=False):
+    """A product's valued attributes, as last flushed (`old`) or as they are now"""
+    state = db.inspect(product)
+    values = {}
+    for name in VALUED_ATTRIBUTES:
+        history = state.attrs[name].history
+        if old and history.deleted:
+            values[name] = history.deleted[0]
+        elif old and history.added:
+            values[name] = None
+        else:
+            values[name] = getattr(product, name)
+    return values
+
+
+class ValuationDeltas:
+    """Per-bucket changes collected from a flush or a bulk stock update"""
+
+    def __init__(self):
+        self.buckets = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+
+    def add(self, bucket, amounts, sign=1):
+        totals = self.buckets[bucket]
+        for name, amount in amounts.items():
+            totals[name] += sign * amount
+
+    def add_product(self, values, sign=1, units=None):
+        bucket, amounts = contribution(values, units)
+        self.add(bucket, amounts, sign)
+
+    def apply(self, connection):
+        """Write the deltas with one upsert per bucket that changed"""
+        for (category_id, metal_type, purity), amounts in self.buckets.items():
+            if not any(amounts.values()):
+                continue
+            _apply_bucket(connection, {
+                'category_id': category_id, 'metal_type': metal_type, 'purity': purity
+            }, amounts)
+
+
+def _apply_bucket(connection, key, amounts):
+    table = InventoryValuation.__table__
+    dialect = connection.dialect.name
+
+    # Atomic upserts where the database has them, so concurrent writers
+    # never race to create the same bucket
+    if dialect == 'mysql':
+        statement = mysql.insert(table).values(**key, **amounts)
+        connection.execute(statement.on_duplicate_key_update(
+            {name: table.c[name] + statement.inserted[name] for name in amounts}))
+        return
+    if dialect == 'sqlite':
+        statement = sqlite.insert(table).values(**key, **amounts)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['category_id', 'metal_type', 'purity'],
+            set_={name: table.c[name] + statement.excluded[name] for name in amounts}))
+        return
+
+    updated = connection.execute(
+        update(table)
+        .where(*(table.c[name] == value for name, value in key.items()))
+        .values({name: table.c[name] + amount for name, amount in amounts.items()})
+    )
+    if not updated.rowcount:
+        connection.execute(insert(table).values(**key, **amounts))
+
+
+def record_stock_change(products, quantities, sign=-1):
+    """Value a bulk quantity change made outside the ORM.
+
+    `products` are the Product rows as loaded before the update and
+    `quantities` the pieces moved per product id; the default sign takes
+    them out of stock, as stock.decrement_stock does.
+    """
+    deltas = ValuationDeltas()
+    for product_id, pieces in quantities.items():
+        product = products.get(product_id)
+        if product is not None:
+            deltas.add_product({name: getattr(product, name) for name in VALUED_ATTRIBUTES},
+                               sign=sign, units=pieces)
+    deltas.apply(db.session.connection())
+
+
+# Make the ORM keep the previous value of every valued attribute, even when
+# it was expired before being set, so a flush can value the product as it was
+def _keep_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+for _name in VALUED_ATTRIBUTES:
+    event.listen(getattr(Product, _name), 'set', _keep_previous_value, active_history=True)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_product_changes(session, flush_context, instances):
+    deltas = ValuationDeltas()
+    for product in session.new:
+        if isinstance(product, Product):
+            deltas.add_product(_product_values(product))
+    for product in session.dirty:
+        if isinstance(product, Product) and session.is_modified(product):
+            deltas.add_product(_product_values(product, old=True), sign=-1)
+            deltas.add_product(_product_values(product))
+    for product in session.deleted:
+        if isinstance(product, Product):
+            deltas.add_product(_product_values(product, old=True), sign=-1)
+    session.info['valuation_deltas'] = deltas
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_product_changes(session, flush_context):
+    deltas = session.info.pop('valuation_deltas', None)
+    if deltas is not None and deltas.buckets:
+        deltas.apply(session.connection())
+
+
+def fill_inventory_valuation(connection):
+    """Replace inventory_valuation with totals computed from the product table"""
+    category_id = func.coalesce(Product.category_id, 0)
+    metal_type = func.coalesce(Product.metal_type, '')
+    purity = func.coalesce(Product.purity, '')
+    quantity = func.coalesce(Product.quantity, 0)
+    source = select(
+        category_id,
+        metal_type,
+        purity,
+        func.sum(quantity),
+        func.coalesce(func.sum(Product.price * quantity), 0),
+        func.coalesce(func.sum(func.coalesce(Product.cost_price, 0) * quantity), 0),
+        func.coalesce(func.sum(func.coalesce(Product.weight, 0) * quantity), 0)
+    ).group_by(category_id, metal_type, purity)
+
+    connection.execute(delete(InventoryValuation.__table__))
+    connection.execute(insert(InventoryValuation.__table__).from_select(
+        ['category_id', 'metal_type', 'purity', 'units', 'retail_value', 'cost_value', 'gross_weight'],
+        source
+    ))
+
+
+def rebuild_inventory_valuation():
+    """Recompute inventory_valuation from the product table"""
+    try:
+        fill_inventory_valuation(db.session.connection())
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding inventory valuation: {str(e)}")
+        raise
+
+    return db.session.scalar(select(func.count()).select_from(InventoryValuation))
+
+
+def snapshot_inventory_valuation(snapshot_date=None):
+    """Copy the current valuation into the snapshot table, replacing that day's copy"""
+    snapshot_date = snapshot_date or date.today()
+    columns = ['category_id', 'metal_type', 'purity', 'units', 'retail_value', 'cost_value', 'gross_weight']
+
+    try:
+        db.session.execute(delete(InventoryValuationSnapshot)
+                           .where(InventoryValuationSnapshot.snapshot_date == snapshot_date))
+        db.session.execute(insert(InventoryValuationSnapshot).from_select(
+            ['snapshot_date'] + columns,
+            select(literal(snapshot_date, Date),
+                   *(getattr(InventoryValuation, name) for name in columns))
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error taking inventory valuation snapshot: {str(e)}")
+        raise
+
+    return db.session.scalar(select(func.count()).select_from(InventoryValuationSnapshot)
+                             .where(InventoryValuationSnapshot.snapshot_date == snapshot_date))
+
+
+def metal_holdings(report, rows):
+    """Units and grams held per (metal, purity) from the stock valuation report's rows"""
+    metal, purity, units, weight = (report.column_index(name)
+                                    for name in ('metal_type', 'purity', 'units', 'gross_weight'))
+    holdings = defaultdict(lambda: [0, Decimal(0)])
+    for row in rows:
+        if row[metal]:
+            totals = holdings[(row[metal], row[purity])]
+            totals[0] += row[units] or 0
+            totals[1] += Decimal(row[weight] or 0)
+    return sorted((key, tuple(totals)) for key, totals in holdings.items())
+
+
+@app.cli.command('rebuild-inventory-valuation')
+def rebuild_inventory_valuation_command():
+    """Recompute the running inventory valuation from the product table."""
+    rows = rebuild_inventory_valuation()
+    print(f"Rebuilt inventory valuation: {rows} buckets.")
+
+
+@app.cli.command('snapshot-inventory-valuation')
+def snapshot_inventory_valuation_command():
+    """Store today's inventory valuation for historical reports (run daily from cron)."""
+    rows = snapshot_inventory_valuation()
+    print(f"Stored inventory valuation snapshot: {rows} buckets.")